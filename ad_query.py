@@ -0,0 +1,126 @@
+import re
+from datetime import date
+from itertools import product
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+AD_LIBRARY_URL = "https://www.facebook.com/ads/library/"
+
+ACTIVE_STATUSES = ("active", "inactive", "all")
+AD_TYPES = ("all", "political_and_issue_ads", "housing_ads", "employment_ads", "credit_ads")
+MEDIA_TYPES = ("all", "image", "video", "meme", "image_and_meme", "none")
+SEARCH_TYPES = ("keyword_unordered", "keyword_exact_phrase", "page")
+
+COUNTRY_RE = re.compile(r"^[A-Z]{2}$")
+
+DateRange = Tuple[Optional[str], Optional[str]]
+
+
+def _choice(name: str, value: str, allowed: Tuple[str, ...]) -> str:
+    value = (value or "").strip().lower()
+    if value not in allowed:
+        raise ValueError(f"Invalid {name} '{value}', expected one of: {', '.join(allowed)}")
+    return value
+
+
+def _date(name: str, value) -> Optional[str]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return date.fromisoformat(str(value).strip()).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid {name} '{value}', expected YYYY-MM-DD")
+
+
+class AdQuery:
+    """
+    One validated Ad Library search.
+
+    Values are normalised on construction (country upper-cased, enums
+    lower-cased, dates as YYYY-MM-DD) so equal searches compare and hash
+    equal, and `to_url()` encodes every parameter.
+    """
+
+    __slots__ = ('q', 'country', 'media_type', 'active_status', 'ad_type', 'search_type', 'start_date', 'end_date')
+
+    def __init__(self, q: str, country: str = "ALL", media_type: str = "all", active_status: str = "active",
+                 ad_type: str = "all", search_type: str = "keyword_unordered",
+                 start_date=None, end_date=None):
+        self.q = " ".join((q or "").split())
+        if not self.q:
+            raise ValueError("Search term is required")
+        self.country = (country or "ALL").strip().upper()
+        if self.country != "ALL" and not COUNTRY_RE.match(self.country):
+            raise ValueError(f"Invalid country '{country}', expected ALL or a two-letter ISO code")
+        self.media_type = _choice("media type", media_type, MEDIA_TYPES)
+        self.active_status = _choice("active status", active_status, ACTIVE_STATUSES)
+        self.ad_type = _choice("ad type", ad_type, AD_TYPES)
+        self.search_type = _choice("search type", search_type, SEARCH_TYPES)
+        self.start_date = _date("start date", start_date)
+        self.end_date = _date("end date", end_date)
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValueError(f"Start date {self.start_date} is after end date {self.end_date}")
+
+    def key(self) -> Tuple:
+        return tuple(getattr(self, field) for field in self.__slots__)
+
+    def __eq__(self, other):
+        return isinstance(other, AdQuery) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"AdQuery({self.q!r}, {self.label()})"
+
+    def replace(self, **changes) -> "AdQuery":
+        values = {field: getattr(self, field) for field in self.__slots__}
+        values.update(changes)
+        return AdQuery(**values)
+
+    def label(self) -> str:
+        """Short description of the variant, used as provenance on merged results."""
+        parts = [f"country={self.country}", f"media_type={self.media_type}"]
+        if self.start_date or self.end_date:
+            parts.append(f"dates={self.start_date or ''}..{self.end_date or ''}")
+        return ",".join(parts)
+
+    def to_params(self) -> List[Tuple[str, str]]:
+        params = [
+            ("active_status", self.active_status),
+            ("ad_type", self.ad_type),
+            ("country", self.country),
+            ("is_targeted_country", "false"),
+            ("media_type", self.media_type),
+            ("q", self.q),
+            ("search_type", self.search_type),
+        ]
+        if self.start_date:
+            params.append(("start_date[min]", self.start_date))
+        if self.end_date:
+            params.append(("start_date[max]", self.end_date))
+        return params
+
+    def to_url(self) -> str:
+        return f"{AD_LIBRARY_URL}?{urlencode(self.to_params())}"
+
+
+def expand_queries(base: AdQuery, countries: Iterable[str] = None, media_types: Iterable[str] = None,
+                   date_ranges: Iterable[DateRange] = None) -> List[AdQuery]:
+    """
+    Return every country x media type x date range variant of `base`, in order.
+    Variants that normalise to the same search are returned once.
+    """
+    countries = list(countries or [base.country])
+    media_types = list(media_types or [base.media_type])
+    date_ranges = list(date_ranges or [(base.start_date, base.end_date)])
+    queries = []
+    seen = set()
+    for country, media_type, (start, end) in product(countries, media_types, date_ranges):
+        query = base.replace(country=country, media_type=media_type, start_date=start, end_date=end)
+        if query not in seen:
+            seen.add(query)
+            queries.append(query)
+    return queries
@@ -0,0 +1,177 @@
+"""
+Compact ad records.
+
+Run `python ad_record.py` for a memory benchmark comparing bytes per ad of the
+dict shape and AdRecord.
+"""
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+_EMPTY: Tuple[str, ...] = ()
+
+
+def intern_url(url: Optional[str]) -> Optional[str]:
+    """Intern a URL so ads sharing a destination share one string object."""
+    return sys.intern(url) if url else url
+
+
+def intern_domain(url: Optional[str]) -> Optional[str]:
+    """Return the interned host of a URL."""
+    if not url:
+        return None
+    return sys.intern(urlparse(url).netloc.lower())
+
+
+class AdRecord:
+    """
+    Slotted ad record with interned URLs.
+
+    The dict shape repeats the landing URL in `urls`, `original_urls` and
+    `library_page`; here it is stored once and the dict keys are rebuilt by
+    `to_dict()`. Fields not known to the record are kept in `extras`.
+    """
+
+    __slots__ = ('library_id', 'ad_text', 'urls', '_original_urls', '_library_page', 'image_url',
+                 'ad_page_url', 'domain', 'matched_words', 'extras')
+
+    def __init__(self, library_id: Optional[str] = None, ad_text: Optional[str] = None,
+                 urls: Iterable[str] = _EMPTY, original_urls: Optional[Iterable[str]] = None,
+                 library_page: Optional[str] = None, image_url: Optional[str] = None,
+                 ad_page_url: Optional[str] = None, matched_words: Iterable[str] = _EMPTY,
+                 extras: Optional[Dict] = None):
+        self.library_id = sys.intern(library_id) if library_id else library_id
+        self.ad_text = ad_text
+        self.urls = tuple(intern_url(u) for u in urls) if urls else _EMPTY
+        original = tuple(intern_url(u) for u in original_urls) if original_urls is not None else None
+        # None means "same as urls" / "same as the first URL" - the common case
+        self._original_urls = None if original == self.urls else original
+        first_url = self.urls[0] if self.urls else None
+        self._library_page = None if library_page == first_url else intern_url(library_page)
+        self.image_url = intern_url(image_url)
+        self.ad_page_url = intern_url(ad_page_url)
+        self.domain = intern_domain(first_url)
+        self.matched_words = tuple(sys.intern(w) for w in matched_words) if matched_words else _EMPTY
+        self.extras = extras or None
+
+    @property
+    def original_urls(self) -> Tuple[str, ...]:
+        return self.urls if self._original_urls is None else self._original_urls
+
+    @property
+    def library_page(self) -> Optional[str]:
+        if self._library_page is None:
+            return self.urls[0] if self.urls else None
+        return self._library_page
+
+    @classmethod
+    def from_dict(cls, ad: Dict) -> "AdRecord":
+        known = ('library_id', 'ad_text', 'urls', 'original_urls', 'library_page', 'image_url',
+                 'ad_page_url', 'matched_words')
+        extras = {k: v for k, v in ad.items() if k not in known}
+        return cls(
+            library_id=ad.get('library_id'),
+            ad_text=ad.get('ad_text'),
+            urls=ad.get('urls') or _EMPTY,
+            original_urls=ad.get('original_urls'),
+            library_page=ad.get('library_page'),
+            image_url=ad.get('image_url'),
+            ad_page_url=ad.get('ad_page_url'),
+            matched_words=ad.get('matched_words') or _EMPTY,
+            extras=extras,
+        )
+
+    def to_dict(self) -> Dict:
+        """Return the ad in the dict shape used by the apps and exports."""
+        ad = {
+            'urls': list(self.urls),
+            'original_urls': list(self.original_urls),
+            'library_id': self.library_id,
+            'ad_text': self.ad_text,
+            'library_page': self.library_page,
+            'image_url': self.image_url,
+            'ad_page_url': self.ad_page_url,
+        }
+        if self.matched_words:
+            ad['matched_words'] = list(self.matched_words)
+        if self.extras:
+            ad.update(self.extras)
+        return ad
+
+    # Read-only mapping access so code written against dicts keeps working
+    def get(self, key: str, default=None):
+        if key in ('original_urls', 'library_page'):
+            return getattr(self, key)
+        if key in self.__slots__ and not key.startswith('_'):
+            value = getattr(self, key)
+            if key in ('urls', 'matched_words'):
+                return list(value) if value else (default if key == 'matched_words' else [])
+            return value
+        if self.extras:
+            return self.extras.get(key, default)
+        return default
+
+    def __getitem__(self, key: str):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __repr__(self):
+        return f"AdRecord(library_id={self.library_id!r}, domain={self.domain!r})"
+
+
+_MISSING = object()
+
+
+def records_to_dicts(records: Iterable[AdRecord]) -> List[Dict]:
+    return [record.to_dict() for record in records]
+
+
+def annotate(ad, key: str, value):
+    """Set a field on a dict ad or an AdRecord (whose unknown fields live in extras)."""
+    if isinstance(ad, dict):
+        ad[key] = value
+    else:
+        ad.extras = dict(ad.extras or {}, **{key: value})
+
+
+def _benchmark(count: int = 100000):
+    """Compare the memory footprint of dict ads and AdRecords built from freshly parsed strings."""
+    import random
+    import tracemalloc
+
+    domains = [f"https://www.site{i}.com/landing/page-{i}?utm_source=facebook" for i in range(200)]
+    random.seed(0)
+
+    def fresh_ads():
+        for i in range(count):
+            # Rebuild strings per ad, as the HTML parser does, so equal URLs are distinct objects
+            url = "".join(random.choice(domains))
+            yield {
+                "urls": [url],
+                "original_urls": [url[:]],
+                "library_id": str(1000000000000000 + i),
+                "ad_text": f"Ad copy number {i} with some descriptive text about the offer",
+                "library_page": "".join(url),
+                "image_url": f"https://scontent.fbcdn.net/v/t45/{i}.jpg",
+                "ad_page_url": None,
+            }
+
+    results = {}
+    for label, build in (("dict", lambda ad: ad), ("AdRecord", AdRecord.from_dict)):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        ads = [build(ad) for ad in fresh_ads()]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        used = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        results[label] = used / len(ads)
+        del ads
+    for label, per_ad in results.items():
+        print(f"{label:>9}: {per_ad:,.0f} bytes per ad")
+    print(f"AdRecord saves {1 - results['AdRecord'] / results['dict']:.0%} per ad ({count:,} ads)")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,280 @@
+"""
+Non-interactive batch sweep over many search terms.
+
+Example:
+    python batch_scrape.py --terms terms.txt --patterns target_urls.txt \
+        --concurrency 4 --format ndjson --output results.ndjson
+
+Use --processes N to shard terms (and --links bulk ad links) across worker processes.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from facebook_ad_scraper import DEFAULT_WATCH_WORDS, FacebookAdScraper
+from image_cache import ImageCache
+from landing_pages import LandingPageCrawler, ad_destination
+from profiling import profile_job
+from seen_set import SeenSet, ad_seen_key
+from sharded_crawl import ShardedCrawler
+
+
+def read_lines(path: Optional[str]) -> List[str]:
+    """Read non-empty, non-comment lines from a text file."""
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def is_new_destination(seen: SeenSet, ad: Dict) -> bool:
+    """Record an ad's landing page in the seen-set; True the first time a destination turns up."""
+    destination = ad_destination(ad)
+    return destination is not None and not seen.check_and_add('url', destination)
+
+
+class BatchRunner:
+    """Run a sweep of search terms across a pool of scrapers, one scraper per worker thread."""
+
+    def __init__(self, url_patterns: List[str], watch_words: Optional[List[str]] = None, concurrency: int = 1,
+                 image_cache: Optional[ImageCache] = None, landing_pages: Optional[LandingPageCrawler] = None,
+                 seen: Optional[SeenSet] = None):
+        self.url_patterns = url_patterns
+        self.watch_words = watch_words
+        self.concurrency = max(1, concurrency)
+        self.image_cache = image_cache
+        self.landing_pages = landing_pages
+        # Ads already emitted, in this sweep or (with a persisted seen-set) earlier ones
+        self.seen = seen if seen is not None else SeenSet(exact=True)
+        self.image_stats = {'urls': 0, 'cache_hits': 0, 'downloaded': 0, 'failed': 0, 'seconds': 0.0}
+        self._local = threading.local()
+        self._scrapers: List[FacebookAdScraper] = []
+        self._lock = threading.Lock()
+
+    def _scraper(self) -> FacebookAdScraper:
+        scraper = getattr(self._local, 'scraper', None)
+        if scraper is None:
+            scraper = FacebookAdScraper(quiet_mode=True)
+            if self.watch_words is not None:
+                scraper.set_watch_words(self.watch_words)
+            self._local.scraper = scraper
+            with self._lock:
+                self._scrapers.append(scraper)
+        return scraper
+
+    def _run_term(self, term: str) -> Dict:
+        scraper = self._scraper()
+        started = time.monotonic()
+        ads = scraper.search_ads(term, self.url_patterns)
+        # search_ads has already marked ads matching the watch words
+        for ad in ads:
+            ad['search_term'] = term
+        if self.image_cache:
+            image_stats = self.image_cache.attach_images(ads)
+            with self._lock:
+                for key in self.image_stats:
+                    self.image_stats[key] += image_stats[key]
+        if self.landing_pages:
+            self.landing_pages.scan_ads(ads, scraper.watch_words)
+        return {'term': term, 'ads': ads, 'seconds': time.monotonic() - started}
+
+    def run(self, terms: List[str], on_ad) -> Dict:
+        """Search every term, calling `on_ad(ad)` as results arrive; returns the run summary."""
+        summary = {'terms': len(terms), 'ads': 0, 'duplicates': 0, 'new_destinations': 0, 'flagged': 0,
+                   'failed_terms': [], 'per_term_seconds': {}}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self._run_term, term): term for term in terms}
+            for future in as_completed(futures):
+                term = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    print(f"Search failed for '{term}': {e}", file=sys.stderr)
+                    summary['failed_terms'].append(term)
+                    continue
+                summary['per_term_seconds'][term] = round(outcome['seconds'], 2)
+                for ad in outcome['ads']:
+                    # The same ad often turns up under several terms
+                    if self.seen.check_and_add(*ad_seen_key(ad)):
+                        summary['duplicates'] += 1
+                        continue
+                    summary['ads'] += 1
+                    summary['new_destinations'] += is_new_destination(self.seen, ad)
+                    if ad.get('matched_words') or ad.get('landing_matched_words'):
+                        summary['flagged'] += 1
+                    on_ad(ad)
+        summary['elapsed_seconds'] = round(time.monotonic() - started, 2)
+        retries = 0
+        for scraper in self._scrapers:
+            retries += scraper.get_run_stats()['retries']
+        summary['retries'] = retries
+        summary['seen_set'] = self.seen.get_stats()
+        if self.image_cache:
+            images = dict(self.image_stats)
+            images['hit_rate'] = round(images['cache_hits'] / images['urls'], 3) if images['urls'] else 0.0
+            images['seconds'] = round(images['seconds'], 2)
+            summary['images'] = images
+        if self.landing_pages:
+            summary['landing_pages'] = self.landing_pages.get_stats()
+        return summary
+
+    def close(self):
+        for scraper in self._scrapers:
+            try:
+                scraper.close()
+            except Exception as e:
+                print(f"Error closing scraper: {e}", file=sys.stderr)
+        self._scrapers = []
+
+
+def run_sharded(processes: Optional[int], terms: List[str], links: List[str], url_patterns: List[str],
+                watch_words: Optional[List[str]], image_cache: Optional[ImageCache], on_ad,
+                landing_pages: Optional[LandingPageCrawler] = None, seen: Optional[SeenSet] = None) -> Dict:
+    """Run the sweep through a ShardedCrawler process pool and return its summary."""
+    crawler = ShardedCrawler(processes, url_patterns, watch_words, seen)
+    # Landing pages are scanned here rather than in the workers so their cache is shared
+    landing_words = watch_words if watch_words is not None else DEFAULT_WATCH_WORDS
+    flagged = 0
+    new_destinations = 0
+    batch: List[Dict] = []
+
+    def flush():
+        nonlocal flagged, new_destinations
+        if image_cache:
+            image_cache.attach_images(batch)
+        if landing_pages:
+            landing_pages.scan_ads(batch, landing_words)
+        for ad in batch:
+            new_destinations += is_new_destination(crawler.seen, ad)
+            if ad.get('matched_words') or ad.get('landing_matched_words'):
+                flagged += 1
+            on_ad(ad)
+        batch.clear()
+
+    for ad in crawler.run(terms, links):
+        batch.append(ad)
+        if len(batch) >= 100:
+            flush()
+    flush()
+    summary = dict(crawler.stats)
+    summary['flagged'] = flagged
+    summary['new_destinations'] = new_destinations
+    summary['seen_set'] = crawler.seen.get_stats()
+    if landing_pages:
+        summary['landing_pages'] = landing_pages.get_stats()
+    summary['failed_terms'] = [e['task'][1] for e in summary['errors'] if e['task']]
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a non-interactive Facebook Ad Library sweep.")
+    parser.add_argument('--terms', help="File with one search term per line")
+    parser.add_argument('--links', help="File with one Ad Library ad link per line (bulk scrape)")
+    parser.add_argument('--patterns', help="File with one URL pattern per line (e.g. target_urls.txt)")
+    parser.add_argument('--watch-words', help="File with one watch word per line (defaults to the built-in list)")
+    parser.add_argument('--concurrency', type=int, default=1, help="Number of searches to run in parallel")
+    parser.add_argument('--processes', type=int, default=0,
+                        help="Shard work across this many worker processes instead of threads")
+    parser.add_argument('--format', choices=['ndjson', 'parquet'], default='ndjson', help="Output format")
+    parser.add_argument('--image-cache', help="Download creatives into this content-addressed cache directory")
+    parser.add_argument('--scan-landing-pages', action='store_true',
+                        help="Fetch each unique ad destination once and flag watch words found on the page")
+    parser.add_argument('--landing-cache', help="Keep scanned landing pages in this directory between runs")
+    parser.add_argument('--landing-ttl', type=int, default=24 * 3600,
+                        help="Seconds before a cached landing page is fetched again (default: 1 day)")
+    parser.add_argument('--seen-set', help="Persist the seen-set of emitted ads at this path, so later sweeps "
+                                           "skip ads already emitted by earlier ones")
+    parser.add_argument('--seen-exact', action='store_true',
+                        help="Confirm seen-set hits against an exact on-disk key table (no false positives)")
+    parser.add_argument('--output', default='-', help="Output file, or '-' for stdout (default)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the sweep (cProfile, stack samples, tracemalloc) and write the reports "
+                             "next to the output")
+    parser.add_argument('--profile-dir', help="Directory for --profile reports (default: the output's directory, "
+                                              "or ./profiles when writing to stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    terms = read_lines(args.terms)
+    links = read_lines(args.links)
+    patterns = read_lines(args.patterns)
+    watch_words = read_lines(args.watch_words) if args.watch_words else None
+    if not terms and not links:
+        print("No search terms or links found", file=sys.stderr)
+        return 2
+
+    to_stdout = args.output == '-'
+    rows: List[Dict] = []
+    out = None
+    if args.format == 'ndjson':
+        out = sys.stdout if to_stdout else open(args.output, "w", encoding="utf-8")
+
+    def on_ad(ad):
+        if out is not None:
+            out.write(json.dumps(ad, default=str) + "\n")
+            out.flush()
+        else:
+            rows.append(ad)
+
+    image_cache = ImageCache(args.image_cache) if args.image_cache else None
+    landing_pages = (LandingPageCrawler(ttl_seconds=args.landing_ttl, cache_dir=args.landing_cache)
+                     if args.scan_landing_pages or args.landing_cache else None)
+    if args.seen_exact and not args.seen_set:
+        print("--seen-exact needs --seen-set", file=sys.stderr)
+        return 2
+    try:
+        seen = SeenSet(args.seen_set, exact=args.seen_exact) if args.seen_set else None
+    except ValueError as e:
+        print(f"Cannot open seen-set: {e}", file=sys.stderr)
+        return 2
+    profile_dir = args.profile_dir or (os.path.dirname(os.path.abspath(args.output)) if not to_stdout else None)
+    profile_report = None
+    try:
+        # Keep stdout clean for results: scraper progress output goes to stderr
+        # (worker processes of a sharded run are not profiled, only the coordinating process)
+        with contextlib.redirect_stdout(sys.stderr), \
+                profile_job("batch", profile_dir, enabled=args.profile) as profile_report:
+            if args.processes or links:
+                summary = run_sharded(args.processes or None, terms, links, patterns, watch_words,
+                                      image_cache, on_ad, landing_pages, seen)
+            else:
+                runner = BatchRunner(patterns, watch_words, args.concurrency, image_cache, landing_pages, seen)
+                try:
+                    summary = runner.run(terms, on_ad)
+                finally:
+                    runner.close()
+    finally:
+        if out is not None and not to_stdout:
+            out.close()
+        if seen is not None:
+            seen.close()
+
+    if args.format == 'parquet':
+        import pandas as pd
+        df = pd.DataFrame(rows)
+        if to_stdout:
+            buffer = io.BytesIO()
+            df.to_parquet(buffer, index=False)
+            sys.stdout.buffer.write(buffer.getvalue())
+            sys.stdout.flush()
+        else:
+            df.to_parquet(args.output, index=False)
+
+    if profile_report:
+        summary['profile'] = profile_report
+    print(json.dumps({'summary': summary}, indent=2), file=sys.stderr)
+    return 1 if summary['failed_terms'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from facebook_ad_scraper import FacebookAdScraper
+
+
+class WarmBrowserPool:
+    """
+    Keep one scraper pre-launched in the background so callers skip browser startup.
+
+    `acquire()` hands out the warm standby when it is ready and immediately
+    starts launching the next one; if no standby is ready it falls back to a
+    cold start. Cold-start and warm-acquire times are tracked so the time saved
+    per request can be reported.
+    """
+
+    def __init__(self, quiet_mode: bool = True, prelaunch: bool = True):
+        self.quiet_mode = quiet_mode
+        self._lock = threading.Lock()
+        self._standby: Optional[FacebookAdScraper] = None
+        self._launching: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats = {'warm_hits': 0, 'cold_starts': 0, 'launch_failures': 0,
+                      'cold_start_seconds': 0.0, 'warm_acquire_seconds': 0.0}
+        if prelaunch:
+            self._launch_standby()
+
+    def _launch_standby(self):
+        with self._lock:
+            if self._closed or self._standby is not None or (self._launching and self._launching.is_alive()):
+                return
+            self._launching = threading.Thread(target=self._launch, name="warm-browser", daemon=True)
+            self._launching.start()
+
+    def _launch(self):
+        started = time.monotonic()
+        try:
+            scraper = FacebookAdScraper(quiet_mode=self.quiet_mode)
+        except Exception as e:
+            print(f"Error pre-launching standby browser: {e}")
+            with self._lock:
+                self.stats['launch_failures'] += 1
+            return
+        elapsed = time.monotonic() - started
+        with self._lock:
+            # Background launches are cold starts too; they calibrate the savings estimate
+            self.stats['cold_start_seconds'] += elapsed
+            self.stats['cold_starts'] += 1
+            if self._closed:
+                scraper.close()
+                return
+            self._standby = scraper
+
+    def acquire(self) -> FacebookAdScraper:
+        """Return a ready scraper (the caller owns it and must close it)."""
+        started = time.monotonic()
+        with self._lock:
+            scraper, self._standby = self._standby, None
+        if scraper is not None and not scraper.ensure_driver_active():
+            scraper.close()
+            scraper = None
+        if scraper is None:
+            scraper = FacebookAdScraper(quiet_mode=self.quiet_mode)
+            with self._lock:
+                self.stats['cold_starts'] += 1
+                self.stats['cold_start_seconds'] += time.monotonic() - started
+        else:
+            with self._lock:
+                self.stats['warm_hits'] += 1
+                self.stats['warm_acquire_seconds'] += time.monotonic() - started
+        self._launch_standby()
+        return scraper
+
+    def get_stats(self) -> Dict:
+        """Return hit counts, average cold/warm acquire times and the estimated time saved."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['standby_ready'] = self._standby is not None
+        avg_cold = stats['cold_start_seconds'] / stats['cold_starts'] if stats['cold_starts'] else 0.0
+        avg_warm = stats['warm_acquire_seconds'] / stats['warm_hits'] if stats['warm_hits'] else 0.0
+        stats['avg_cold_start_seconds'] = round(avg_cold, 2)
+        stats['avg_warm_acquire_seconds'] = round(avg_warm, 3)
+        stats['saved_per_request_seconds'] = round(max(0.0, avg_cold - avg_warm), 2) if stats['warm_hits'] else 0.0
+        stats['total_saved_seconds'] = round(stats['saved_per_request_seconds'] * stats['warm_hits'], 2)
+        stats['cold_start_seconds'] = round(stats['cold_start_seconds'], 2)
+        stats['warm_acquire_seconds'] = round(stats['warm_acquire_seconds'], 3)
+        return stats
+
+    def close(self):
+        """Stop pre-launching and close the standby browser."""
+        with self._lock:
+            self._closed = True
+            scraper, self._standby = self._standby, None
+        if scraper:
+            scraper.close()
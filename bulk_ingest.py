@@ -0,0 +1,160 @@
+"""
+Streaming ingestion of bulk ad-link files.
+
+Links are read from CSV in pandas chunks or from Excel with openpyxl in
+read-only mode, normalised and de-duplicated on the fly, and scraped results
+are appended to an NDJSON spool on disk so memory stays flat however large
+the upload is.
+"""
+import json
+import os
+import re
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse, urlunparse
+
+import pandas as pd
+
+AD_LIBRARY_URL = "https://www.facebook.com/ads/library/"
+LIBRARY_ID_RE = re.compile(r"^\d{10,20}$")
+
+
+def _is_excel(name: str) -> bool:
+    return name.lower().endswith((".xlsx", ".xlsm"))
+
+
+def read_columns(file: BinaryIO, name: str) -> List[str]:
+    """Return the header row of an uploaded CSV/XLSX without loading its rows."""
+    file.seek(0)
+    if _is_excel(name):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            header = next(workbook.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        return [str(value) for value in header if value is not None]
+    return [str(column) for column in pd.read_csv(file, nrows=0).columns]
+
+
+def iter_column(file: BinaryIO, name: str, column: str, chunksize: int = 5000) -> Iterator[str]:
+    """Yield the non-empty values of one column, holding at most one chunk in memory."""
+    file.seek(0)
+    if _is_excel(name):
+        from openpyxl import load_workbook
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(value) if value is not None else None for value in next(rows, ())]
+            if column not in header:
+                raise Exception(f"Column '{column}' not found in {name}")
+            index = header.index(column)
+            for row in rows:
+                if index < len(row) and row[index] is not None:
+                    yield str(row[index])
+        finally:
+            workbook.close()
+        return
+    for chunk in pd.read_csv(file, usecols=[column], dtype=str, chunksize=chunksize):
+        for value in chunk[column].dropna():
+            yield value
+
+
+def normalize_ad_link(link: str) -> Optional[str]:
+    """
+    Return a canonical form of an ad link, or None if it is not a usable link.
+    Ad Library links (and bare library IDs) become .../ads/library/?id=<id>.
+    """
+    link = (link or "").strip()
+    if not link:
+        return None
+    if LIBRARY_ID_RE.match(link):
+        return f"{AD_LIBRARY_URL}?id={link}"
+    if any(c.isspace() for c in link):
+        return None
+    if "://" not in link:
+        link = "https://" + link
+    parsed = urlparse(link)
+    host = parsed.netloc.lower()
+    if parsed.scheme not in ("http", "https") or "." not in host:
+        return None
+    if host.endswith("facebook.com") and parsed.path.rstrip("/").endswith("/ads/library"):
+        library_id = parse_qs(parsed.query).get("id", [None])[0]
+        if library_id and LIBRARY_ID_RE.match(library_id.strip()):
+            return f"{AD_LIBRARY_URL}?id={library_id.strip()}"
+    return urlunparse((parsed.scheme.lower(), host, parsed.path or "/", parsed.params, parsed.query, ""))
+
+
+def unique_links(values: Iterable[str], stats: Optional[Dict] = None) -> Iterator[str]:
+    """Normalise and de-duplicate links lazily; counts go into `stats` if given."""
+    seen = set()
+    if stats is not None:
+        stats.update({'rows': 0, 'invalid': 0, 'duplicates': 0, 'unique': 0})
+    for value in values:
+        link = normalize_ad_link(value)
+        if stats is not None:
+            stats['rows'] += 1
+        if link is None:
+            if stats is not None:
+                stats['invalid'] += 1
+            continue
+        if link in seen:
+            if stats is not None:
+                stats['duplicates'] += 1
+            continue
+        seen.add(link)
+        if stats is not None:
+            stats['unique'] += 1
+        yield link
+
+
+class ResultSpool:
+    """
+    Append-only NDJSON file of results with an offset index for paging.
+
+    Only the byte offset of each line is kept in memory (8 bytes per ad), so a
+    page of results can be read back without loading the whole run.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._offsets = array('q')
+        self._file = open(self.path, "w+b")
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def append(self, ad: Dict):
+        self._file.seek(0, os.SEEK_END)
+        self._offsets.append(self._file.tell())
+        self._file.write(json.dumps(ad, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def read_page(self, offset: int, limit: int) -> List[Dict]:
+        """Read `limit` results starting at index `offset`."""
+        if offset >= len(self._offsets) or limit <= 0:
+            return []
+        self._file.flush()
+        self._file.seek(self._offsets[offset])
+        ads = []
+        for _ in range(min(limit, len(self._offsets) - offset)):
+            ads.append(json.loads(self._file.readline()))
+        return ads
+
+    def iter_chunks(self, size: int = 5000) -> Iterator[List[Dict]]:
+        """Yield every stored result in chunks of `size`."""
+        for offset in range(0, len(self._offsets), size):
+            yield self.read_page(offset, size)
+
+    def close(self, delete: bool = False):
+        if not self._file.closed:
+            self._file.close()
+        if delete:
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,94 @@
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+# Default cap on Chrome's HTTP disk cache when a persistent profile is used
+DEFAULT_DISK_CACHE_MB = 256
+LOCK_NAME = ".scraper.lock"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_age(lock_path: Path) -> float:
+    try:
+        return time.time() - lock_path.stat().st_mtime
+    except FileNotFoundError:
+        return float("inf")
+
+
+class ProfileLease:
+    """
+    Exclusive lease on one persistent Chrome profile directory.
+
+    Chrome refuses to share a user-data-dir between running instances, so
+    <base>/profile-0, profile-1, ... are handed out one per browser, each
+    guarded by a lock file holding the owner's PID. Locks left behind by dead
+    processes are reclaimed, and released profiles keep their HTTP cache,
+    service workers and Facebook login for the next browser.
+    """
+
+    def __init__(self, base_dir: str, max_profiles: int = 8):
+        self.base_dir = Path(base_dir)
+        self.max_profiles = max_profiles
+        self.path: Optional[Path] = None
+
+    def acquire(self) -> Optional[Path]:
+        """Claim a free profile directory, or return None if all are in use."""
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        for index in range(self.max_profiles):
+            profile = self.base_dir / f"profile-{index}"
+            profile.mkdir(exist_ok=True)
+            lock_path = profile / LOCK_NAME
+            if self._try_lock(lock_path):
+                self.path = profile
+                return profile
+        return None
+
+    def _try_lock(self, lock_path: Path) -> bool:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                owner = int(lock_path.read_text().strip() or 0)
+            except (OSError, ValueError):
+                owner = 0
+            if owner and _pid_alive(owner):
+                return False
+            if not owner and _lock_age(lock_path) < 60:
+                # Another process has just created the lock and not written its PID yet
+                return False
+            # Stale lock from a crashed process
+            try:
+                lock_path.unlink()
+            except FileNotFoundError:
+                pass
+            return self._try_lock(lock_path)
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def release(self):
+        if self.path:
+            try:
+                (self.path / LOCK_NAME).unlink()
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+def disk_cache_bytes() -> int:
+    """Return the configured Chrome disk cache size (CHROME_DISK_CACHE_MB) in bytes."""
+    try:
+        megabytes = int(os.getenv("CHROME_DISK_CACHE_MB", DEFAULT_DISK_CACHE_MB))
+    except ValueError:
+        megabytes = DEFAULT_DISK_CACHE_MB
+    return megabytes * 1024 * 1024
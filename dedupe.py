@@ -0,0 +1,126 @@
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Mersenne prime used for the universal hash family (fits int64 products of 31-bit values)
+_PRIME = (1 << 31) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Return the set of lower-cased word n-grams of `text`."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Compute MinHash signatures with a fixed, seeded family of hash permutations."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, _PRIME, size=num_perm, dtype=np.int64)
+        self.b = rng.randint(0, _PRIME, size=num_perm, dtype=np.int64)
+
+    def signature(self, shingle_set: set) -> Optional[np.ndarray]:
+        """Return the MinHash signature of a shingle set, or None if it is empty."""
+        if not shingle_set:
+            return None
+        hashes = np.fromiter((zlib.crc32(s.encode()) % _PRIME for s in shingle_set),
+                             dtype=np.int64, count=len(shingle_set))
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            # Keep the earliest ad as the root so it becomes the representative
+            if root_j < root_i:
+                root_i, root_j = root_j, root_i
+            self.parent[root_j] = root_i
+
+
+def cluster_ads(ads: List[Dict], threshold: float = 0.6, num_perm: int = 64, bands: int = 16,
+                shingle_size: int = 3) -> List[Dict]:
+    """
+    Group near-duplicate ads by their `ad_text` using MinHash + LSH banding.
+
+    Each ad dict is annotated in place with `cluster_id`, `cluster_size` and
+    `is_representative`; the representative is the first ad seen in the cluster.
+    Candidates that share an LSH bucket are confirmed by estimated Jaccard
+    similarity >= `threshold`, so the work stays roughly linear in the number of ads.
+    """
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    signatures = [hasher.signature(shingles(ad.get('ad_text') or "", shingle_size)) for ad in ads]
+    uf = _UnionFind(len(ads))
+
+    min_agree = threshold * num_perm
+    for band in range(bands):
+        # Each bucket keeps one ad per distinct group that landed in it
+        buckets: Dict[bytes, List[int]] = {}
+        start, stop = band * rows, (band + 1) * rows
+        for i, sig in enumerate(signatures):
+            if sig is None:
+                continue
+            members = buckets.setdefault(sig[start:stop].tobytes(), [])
+            for j in members:
+                if uf.find(j) == uf.find(i) or np.count_nonzero(signatures[j] == sig) >= min_agree:
+                    uf.union(j, i)
+                    break
+            else:
+                members.append(i)
+
+    roots = [uf.find(i) for i in range(len(ads))]
+    sizes: Dict[int, int] = {}
+    for root in roots:
+        sizes[root] = sizes.get(root, 0) + 1
+    for i, (ad, root) in enumerate(zip(ads, roots)):
+        representative = ads[root]
+        ad['cluster_id'] = f"c{representative.get('library_id') or root}"
+        ad['cluster_size'] = sizes[root]
+        ad['is_representative'] = i == root
+    return ads
+
+
+def cluster_summaries(ads: List[Dict]) -> List[Dict]:
+    """Collapse clustered ads into one row per cluster, keyed by the representative ad."""
+    clusters: Dict[str, Dict] = {}
+    for ad in ads:
+        cluster_id = ad.get('cluster_id')
+        if cluster_id is None:
+            continue
+        summary = clusters.get(cluster_id)
+        if summary is None:
+            summary = clusters[cluster_id] = {
+                'cluster_id': cluster_id,
+                'cluster_size': ad.get('cluster_size', 1),
+                'representative_id': None,
+                'ad_text': None,
+                'library_ids': [],
+                'matched_words': [],
+            }
+        if ad.get('is_representative'):
+            summary['representative_id'] = ad.get('library_id')
+            summary['ad_text'] = ad.get('ad_text')
+            summary['image_url'] = ad.get('image_url')
+        if ad.get('library_id'):
+            summary['library_ids'].append(ad['library_id'])
+        for word in ad.get('matched_words') or []:
+            if word not in summary['matched_words']:
+                summary['matched_words'].append(word)
+    return list(clusters.values())
@@ -0,0 +1,107 @@
+import threading
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from graphql_capture import parse_graphql_body
+from landing_pages import pick_destination
+
+TIERS = ('http', 'browser')
+
+
+def pooled_session(pool_size: int = 16) -> requests.Session:
+    """Return a requests session that keeps up to `pool_size` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def library_id_from_link(ad_link: str) -> Optional[str]:
+    return parse_qs(urlparse(ad_link).query).get('id', [None])[0]
+
+
+def parse_detail_html(html: str, ad_link: str) -> Optional[Dict]:
+    """
+    Parse an Ad Library `?id=` detail page fetched over plain HTTP.
+
+    Prefers the ad snapshot embedded in the page's JSON script tags and falls
+    back to a server-rendered article. Returns None when the page does not
+    carry the ad text (login wall, client-only render), so the caller can
+    escalate to the browser.
+    """
+    library_id = library_id_from_link(ad_link)
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup.find_all("script", attrs={"type": "application/json"}):
+        text = script.string or ""
+        if "ad_archive_id" not in text:
+            continue
+        records, _ = parse_graphql_body(text)
+        for record in records:
+            if library_id and record.library_id != library_id:
+                continue
+            if not record.ad_text:
+                continue
+            return {
+                'ad_text': record.ad_text,
+                'library_id': record.library_id,
+                'urls': [ad_link],
+                'original_urls': [ad_link],
+                'library_page': ad_link,
+                'image_url': record.image_url,
+                'ad_page_url': ad_link,
+                'destination_url': record.urls[0] if record.urls else None,
+            }
+    article = soup.select_one("div[role='article']")
+    if article:
+        ad_text = article.get_text(" ", strip=True)
+        if ad_text:
+            img = article.find("img", src=True)
+            return {
+                'ad_text': ad_text,
+                'library_id': library_id,
+                'urls': [ad_link],
+                'original_urls': [ad_link],
+                'library_page': ad_link,
+                'image_url': img["src"] if img else None,
+                'ad_page_url': ad_link,
+                'destination_url': pick_destination(a["href"] for a in article.find_all("a", href=True)),
+            }
+    return None
+
+
+class TierStats:
+    """Count which tier served each detail page and how long each tier took."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {tier: {'attempts': 0, 'served': 0, 'seconds': 0.0} for tier in TIERS}
+        self.escalations = 0
+
+    def record(self, tier: str, seconds: float, served: bool):
+        with self._lock:
+            tier_stats = self.stats[tier]
+            tier_stats['attempts'] += 1
+            tier_stats['seconds'] += seconds
+            if served:
+                tier_stats['served'] += 1
+            elif tier == 'http':
+                self.escalations += 1
+
+    def get_stats(self) -> Dict:
+        """Return per-tier page share and average latency."""
+        with self._lock:
+            stats = {tier: dict(values) for tier, values in self.stats.items()}
+            escalations = self.escalations
+        served = sum(values['served'] for values in stats.values())
+        for values in stats.values():
+            values['share'] = round(values['served'] / served, 3) if served else 0.0
+            values['avg_seconds'] = round(values['seconds'] / values['attempts'], 3) if values['attempts'] else 0.0
+            values['seconds'] = round(values['seconds'], 2)
+        stats['pages'] = served
+        stats['escalations'] = escalations
+        return stats
@@ -10,6 +10,7 @@ from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
 import time
 import json
+import sys
 from typing import List, Dict, Optional
 import os
 from dotenv import load_dotenv
@@ -17,19 +18,74 @@ import urllib3
 import socket
 from urllib.parse import unquote, parse_qs, urlparse
 from selenium.webdriver.common.action_chains import ActionChains
-import re
 import subprocess
 import shutil
 import requests
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+import uuid
+from rate_limiter import THROTTLE_STATUS_CODES, FetchScheduler, get_default_scheduler, looks_like_login_wall
+from retry import Retrier, classify_error
+from ad_record import AdRecord
+from chrome_profile import ProfileLease, disk_cache_bytes
+from ad_query import AdQuery, DateRange, expand_queries
+from detail_fetch import TierStats, library_id_from_link, parse_detail_html, pooled_session
+from landing_pages import pick_destination
+from search_result import SearchResult
+from profiling import profile_job
+from page_archive import PageArchive
+from proxy_pool import ProxyPool, get_default_proxy_pool
+from page_parsers import ExtractionPlan, background_image_url, parse_search_html
+from graphql_capture import INITIAL_DATA_SCRIPT, NetworkCapture, parse_graphql_body
+from scroll_observer import (AD_CARD_SELECTOR, DRAIN_BATCH_SCRIPT, INSTALL_OBSERVER_SCRIPT,
+                             REMOVE_OBSERVER_SCRIPT, records_from_batch)
+
+DEFAULT_WATCH_WORDS = ["swimsuit", "underwear", "lingerie", "dating", "labiaplasty", "massage", "breast"]
+
+
+def _holds_driver(method):
+    """Run a method while holding the scraper's driver lock (navigation and DOM reads are not shareable)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._driver_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class FacebookAdScraper:
-    def __init__(self, quiet_mode=True):
+    def __init__(self, quiet_mode=True, scheduler: Optional[FetchScheduler] = None, capture_network: bool = False,
+                 page_archive: Optional[PageArchive] = None, proxy_pool: Optional[ProxyPool] = None):
         self.driver = None
         self.quiet_mode = quiet_mode
+        # Enable the DevTools performance log so search_ads_capture can read network responses
+        self.capture_network = capture_network or os.getenv('CAPTURE_NETWORK', 'false').lower() in ['1', 'true', 'yes']
+        # Persistent Chrome profile (CHROME_USER_DATA_DIR), leased per browser
+        self.profile_lease: Optional[ProfileLease] = None
+        # Per-host rate limiter shared by every fetch path (HTTP and browser)
+        self.scheduler = scheduler or get_default_scheduler()
+        # Retry/backoff layer with a per-host circuit breaker
+        self.retrier = Retrier(classify=self._classify_fetch_error, quiet_mode=quiet_mode)
+        # Ad detail pages are tried over plain HTTP before the browser (DETAIL_HTTP_FIRST)
+        self.http_first = os.getenv('DETAIL_HTTP_FIRST', 'true').lower() in ['1', 'true', 'yes']
+        self.detail_stats = TierStats()
+        # Search page extraction matchers, compiled once for this scraper
+        self.extraction_plan = ExtractionPlan()
+        self._detail_session = None
+        # Raw HTML of fetched search/detail pages, for re-extraction (PAGE_ARCHIVE_DIR)
+        archive_dir = os.getenv('PAGE_ARCHIVE_DIR')
+        self.page_archive = page_archive or (PageArchive(archive_dir) if archive_dir else None)
+        # Egress proxies (PROXY_POOL / PROXY_POOL_FILE); the browser and logged-in session share one
+        self.proxy_pool = proxy_pool or get_default_proxy_pool()
+        self.browser_proxy = None
+        # One browser is shared by every caller; HTTP searches run concurrently without it
+        self._driver_lock = threading.RLock()
+        self._session_lock = threading.Lock()
         self.setup_driver()
-        self.flagged_ads = []  # Store flagged ads
+        # Flags of the most recently completed search; each SearchResult carries its own
+        self.flagged_ads = []
         # Set predefined watch words
-        self.watch_words = ["swimsuit", "underwear", "lingerie", "dating", "labiaplasty", "massage", "breast"]
+        self.watch_words = list(DEFAULT_WATCH_WORDS)
         if not self.quiet_mode:
             print(f"Watching for the following words: {', '.join(self.watch_words)}")
         load_dotenv()  # Load environment variables
@@ -37,7 +93,12 @@ class FacebookAdScraper:
         # Session for HTTP-based requests
         self.session = None
         self.http_headers = None
+        # Set once login_to_facebook has run in the current browser
+        self.logged_in = False
+        # Sticky proxy key when there is no FB_EMAIL login to share; unique, unlike id(self)
+        self._anonymous_key = f"scraper-{uuid.uuid4().hex}"
         
+    @_holds_driver
     def setup_driver(self):
         """Set up the Chrome WebDriver with appropriate options."""
         try:
@@ -103,7 +164,30 @@ class FacebookAdScraper:
             chrome_options.add_argument('--start-maximized')
             chrome_options.add_argument('--disable-blink-features=AutomationControlled')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+            if self.proxy_pool:
+                # Sticky per login, so the cookies handed to the HTTP session keep their IP
+                self.browser_proxy = self.proxy_pool.choose(self._login_key(), hold=False)
+                chrome_options.add_argument(self.browser_proxy.chrome_argument())
+                if not self.quiet_mode:
+                    print(f"Routing the browser through proxy {self.browser_proxy.url}")
+
+            # Reuse a persistent profile so the HTTP cache, service workers and login survive restarts
+            user_data_dir = os.getenv("CHROME_USER_DATA_DIR")
+            if user_data_dir:
+                self.profile_lease = ProfileLease(user_data_dir)
+                profile_dir = self.profile_lease.acquire()
+                if profile_dir:
+                    chrome_options.add_argument(f'--user-data-dir={profile_dir.resolve()}')
+                    chrome_options.add_argument(f'--disk-cache-size={disk_cache_bytes()}')
+                    if not self.quiet_mode:
+                        print(f"Using persistent Chrome profile: {profile_dir}")
+                else:
+                    print("Warning: all persistent Chrome profiles are in use; starting with a temporary profile")
             
+            if self.capture_network:
+                chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
             chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
             chrome_options.add_experimental_option('useAutomationExtension', False)
             
@@ -170,6 +254,7 @@ class FacebookAdScraper:
             self.cleanup_driver()
             raise
         
+    @_holds_driver
     def cleanup_driver(self):
         """Clean up the WebDriver and its resources."""
         if self.driver:
@@ -179,7 +264,12 @@ class FacebookAdScraper:
                 print(f"Error during driver cleanup: {str(e)}")
             finally:
                 self.driver = None
-                
+        self.logged_in = False
+        if self.profile_lease:
+            self.profile_lease.release()
+            self.profile_lease = None
+
+    @_holds_driver
     def ensure_driver_active(self):
         """Ensure the WebDriver is active and responsive."""
         try:
@@ -193,69 +283,74 @@ class FacebookAdScraper:
             self.cleanup_driver()
             return False
         
+    @_holds_driver
     def login_to_facebook(self):
         """Login to Facebook if not already logged in."""
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Navigate to the Facebook login page
-                print("Attempting to access Facebook login page...")
-                self.driver.get("https://www.facebook.com/login")
-                time.sleep(5)
-                # Detect login form by presence of the email input
-                try:
-                    email_input = self.driver.find_element(By.ID, "email")
-                except:
-                    email_input = None
-                if email_input:
-                    # Use environment variables for automated login
-                    email = os.getenv("FB_EMAIL")
-                    password = os.getenv("FB_PASSWORD")
-                    # If credentials missing, allow manual login in a visible browser
-                    if not email or not password:
-                        headless_env = os.getenv('HEADLESS', 'true').lower()
-                        if headless_env in ['1', 'true', 'yes']:
-                            raise Exception("FB_EMAIL and FB_PASSWORD must be set in environment for headless mode.")
-                        print("Login form detected but FB_EMAIL/FB_PASSWORD not set. Please log in manually in the browser window.")
-                        input("After completing manual login, press Enter to continue...")
-                        return True
-                    if not self.quiet_mode:
-                        print("Automated login using FB_EMAIL and FB_PASSWORD...")
-                    pass_input = self.driver.find_element(By.ID, "pass")
-                    email_input.clear()
-                    email_input.send_keys(email)
-                    pass_input.clear()
-                    pass_input.send_keys(password)
-                    pass_input.send_keys(Keys.RETURN)
-                    time.sleep(5)  # wait for authentication
-                else:
-                    if not self.quiet_mode:
-                        print("No login form detected; assuming already authenticated.")
+        login_url = "https://www.facebook.com/login"
+        return self.retrier.call(login_url, lambda: self._login_attempt(login_url))
+
+    def _login_attempt(self, login_url: str) -> bool:
+        """Run a single login attempt; browser errors are retried by the caller."""
+        # Only rebuild the browser when it has actually died
+        if not self.ensure_driver_active():
+            self.setup_driver()
+        # Navigate to the Facebook login page
+        print("Attempting to access Facebook login page...")
+        with self.scheduler.slot(login_url):
+            self.driver.get(login_url)
+        time.sleep(5)
+        # Detect login form by presence of the email input
+        try:
+            email_input = self.driver.find_element(By.ID, "email")
+        except:
+            email_input = None
+        if email_input:
+            # Use environment variables for automated login
+            email = os.getenv("FB_EMAIL")
+            password = os.getenv("FB_PASSWORD")
+            # If credentials missing, allow manual login in a visible browser
+            if not email or not password:
+                headless_env = os.getenv('HEADLESS', 'true').lower()
+                if headless_env in ['1', 'true', 'yes']:
+                    raise Exception("FB_EMAIL and FB_PASSWORD must be set in environment for headless mode.")
+                print("Login form detected but FB_EMAIL/FB_PASSWORD not set. Please log in manually in the browser window.")
+                input("After completing manual login, press Enter to continue...")
+                self.logged_in = True
                 return True
-            except Exception as e:
-                print(f"Error during login attempt {attempt + 1}/{max_retries}: {str(e)}")
-                if attempt < max_retries - 1:
-                    print("Retrying...")
-                    self.cleanup_driver()
-                    time.sleep(5)
-                else:
-                    raise
+            if not self.quiet_mode:
+                print("Automated login using FB_EMAIL and FB_PASSWORD...")
+            pass_input = self.driver.find_element(By.ID, "pass")
+            email_input.clear()
+            email_input.send_keys(email)
+            pass_input.clear()
+            pass_input.send_keys(password)
+            pass_input.send_keys(Keys.RETURN)
+            time.sleep(5)  # wait for authentication
+        else:
+            if not self.quiet_mode:
+                print("No login form detected; assuming already authenticated.")
+        self.logged_in = True
+        return True
 
     def get_final_url(self, url: str) -> str:
         """Get the final URL after any redirects."""
         # First attempt: use requests to follow redirects without a browser
         try:
-            response = requests.get(url, allow_redirects=True, timeout=10)
+            response = self._http_get(url, session=requests, allow_redirects=True, timeout=10)
             if response.url:
                 return response.url
         except Exception:
             pass
         # Fallback: use Selenium navigation in the same window
+        with self._driver_lock:
+            return self._final_url_in_browser(url)
+
+    def _final_url_in_browser(self, url: str) -> str:
         try:
             if not self.ensure_driver_active():
                 self.setup_driver()
             previous_url = self.driver.current_url
-            self.driver.get(url)
+            self._driver_get(url)
             time.sleep(5)
             final_url = self.driver.current_url
             # Navigate back to where we were
@@ -270,22 +365,26 @@ class FacebookAdScraper:
         
     def set_watch_words(self, words: List[str]):
         """Set the list of words to watch for in ads."""
+        # Replaced rather than mutated, so searches already running keep their snapshot
         self.watch_words = [word.lower() for word in words]
         if not self.quiet_mode:
             print(f"Watching for the following words: {', '.join(self.watch_words)}")
 
-    def check_for_watch_words(self, text: str, ad_info: Dict) -> bool:
-        """Check if any watch words appear in the text."""
+    def find_watch_words(self, text: str) -> List[str]:
+        """Return the watch words that appear in the text."""
+        text_lower = (text or "").lower()
+        return [word for word in self.watch_words if word in text_lower]
+
+    def check_for_watch_words(self, text: str, ad_info: Dict, flagged: Optional[List[Dict]] = None) -> bool:
+        """
+        Check if any watch words appear in the text.
+        Matches are recorded in `flagged` if given, otherwise in `self.flagged_ads`.
+        """
         if not self.watch_words:
             return False
-            
-        text_lower = text.lower()
-        found_words = []
-        
-        for word in self.watch_words:
-            if word in text_lower:
-                found_words.append(word)
-                
+
+        found_words = self.find_watch_words(text)
+
         if found_words:
             flagged_info = {
                 'matched_words': found_words,
@@ -294,11 +393,49 @@ class FacebookAdScraper:
                 'library_page': ad_info.get('library_page'),
                 'urls': ad_info.get('urls', [])
             }
-            self.flagged_ads.append(flagged_info)
+            (self.flagged_ads if flagged is None else flagged).append(flagged_info)
             return True
             
         return False
 
+    def flag_clusters(self, ads: List[Dict]) -> List[Dict]:
+        """
+        Check clustered ads (see dedupe.cluster_ads) for watch words, flagging once per cluster.
+        Each ad gets its own `matched_words`; the flagged entry lists the whole cluster.
+        For a SearchResult the flags replace its per-ad `flagged_ads`.
+        """
+        if not self.watch_words:
+            return []
+        clusters: Dict[str, Dict] = {}
+        for ad in ads:
+            found_words = self.find_watch_words(ad.get('ad_text'))
+            if not found_words:
+                continue
+            ad['matched_words'] = found_words
+            cluster_id = ad.get('cluster_id') or ad.get('library_id')
+            flagged_info = clusters.get(cluster_id)
+            if flagged_info is None:
+                flagged_info = clusters[cluster_id] = {
+                    'matched_words': [],
+                    'ad_text': ad.get('ad_text'),
+                    'library_id': ad.get('library_id'),
+                    'library_page': ad.get('library_page'),
+                    'urls': ad.get('urls', []),
+                    'cluster_id': cluster_id,
+                    'cluster_size': ad.get('cluster_size', 1),
+                    'library_ids': []
+                }
+            flagged_info['library_ids'].append(ad.get('library_id'))
+            for word in found_words:
+                if word not in flagged_info['matched_words']:
+                    flagged_info['matched_words'].append(word)
+        flagged = list(clusters.values())
+        if isinstance(ads, SearchResult):
+            ads.flagged_ads = flagged
+        else:
+            self.flagged_ads = flagged
+        return flagged
+
     def _normalize_url(self, url: str) -> str:
         """Normalize a URL by decoding it and extracting from Facebook redirect if needed."""
         if not url:
@@ -482,13 +619,10 @@ class FacebookAdScraper:
                             src = element.get_attribute("src")
                         else:
                             # For non-img elements, check background image
-                            style = element.get_attribute("style")
-                            if style and "background-image" in style:
-                                url_match = re.search(r'url\(["\']?(.*?)["\']?\)', style)
-                                src = url_match.group(1) if url_match else None
-                            else:
-                                    continue
-                            
+                            src = background_image_url(element.get_attribute("style"))
+                            if not src:
+                                continue
+
                         if src and "fbcdn.net" in src:
                             # Try to get size information
                             try:
@@ -502,8 +636,8 @@ class FacebookAdScraper:
                                 return src
                 except Exception as e:
                     print(f"Error with selector {selector}: {str(e)}")
-                                        continue
-                                        
+                    continue
+
             # Last resort: find all images and try to identify the main creative
             print("\nTrying last resort image search...")
             all_images = ad_element.find_elements(By.TAG_NAME, "img")
@@ -519,76 +653,237 @@ class FacebookAdScraper:
                         if area > largest_size:
                             largest_size = area
                             largest_image = src
-                                except:
-                                    continue
-                            
+                except:
+                    continue
+
             if largest_image:
                 print(f"Found largest image in ad: {largest_image}")
                 return largest_image
 
             print("No suitable creative image found")
             return None
-                            
-                        except Exception as e:
+
+        except Exception as e:
             print(f"\nError extracting image URL: {str(e)}")
             return None
 
-    def search_ads(self, search_term: str, url_patterns: List[str] = None) -> List[Dict]:
+    def search_ads(self, search_term: str, url_patterns: List[str] = None, as_records: bool = False,
+                   query: Optional[AdQuery] = None, watch_words: Optional[List[str]] = None) -> SearchResult:
         """
         Search for ads in Facebook Ad Library and collect their details including images.
         First checks if URLs match before collecting other details.
+        Pass as_records=True to get compact AdRecord objects instead of dicts, and
+        `query` to search a specific country, media type or date range.
+        Ads matching the watch words (the scraper's, or `watch_words` for this
+        call only) are marked and listed in the result's `flagged_ads`.
         """
         # Use HTTP + BeautifulSoup for ad scraping instead of in-browser navigation
-        return self._search_ads_http(search_term, url_patterns)
+        records = self._search_ads_http(search_term, url_patterns, query)
+        return self._finish_search(search_term, records, as_records, watch_words)
 
-    def _search_ads_http(self, search_term: str, url_patterns: List[str] = None) -> List[Dict]:
+    def _search_ads_http(self, search_term: str, url_patterns: List[str] = None,
+                         query: Optional[AdQuery] = None) -> List[AdRecord]:
         """Search Facebook Ad Library via HTTP and parse ads with BeautifulSoup."""
-        self.flagged_ads = []
         # Straight HTTP GET against Facebook Ad Library search URL
         session = requests
-        try:
-            from urllib.parse import quote as url_quote
-        except ImportError:
-            from requests.utils import quote as url_quote
-        # Build the search URL using the provided term
-        search_url = f"https://www.facebook.com/ads/library/?active_status=active&ad_type=all&country=ALL&is_targeted_country=false&media_type=all&q={url_quote(search_term)}&search_type=keyword_unordered"
+        # Build the search URL from the query (defaults to all countries and media types)
+        search_url = (query or AdQuery(search_term)).to_url()
         print(f"Fetching ads via HTTP only: {search_url}")
-        # Perform HTTP GET
-        resp = session.get(search_url, timeout=30)
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-        ad_elements = soup.select("div[role='article'], div[data-testid='ad_card']")
-        collected_ads: List[Dict] = []
-        for ad_el in ad_elements:
-            # Extract Learn More link
-            link_tag = ad_el.find("a", href=True)
-            if not link_tag:
-                continue
-            original_url = link_tag["href"]
-            # Filter by patterns
-            if url_patterns:
-                if not any(self._urls_match(original_url, p) for p in url_patterns if p):
+        # Perform HTTP GET (transient failures are retried with backoff)
+        resp = self._http_get(search_url, session=session, raise_for_status=True, timeout=30)
+        records = parse_search_html(resp.text, self.extraction_plan)
+        self._archive_page(search_url, resp.text, 'search', [r.library_id for r in records], search_term)
+        # Filter by patterns
+        if url_patterns and any(url_patterns):
+            records = [r for r in records if any(self._urls_match(r.urls[0], p) for p in url_patterns if p)]
+        return records
+
+    def _archive_page(self, url: str, html: Optional[str], kind: str, library_ids=(),
+                      search_term: Optional[str] = None):
+        """Store a fetched page's raw HTML in the page archive, if one is configured."""
+        if self.page_archive is None or not html:
+            return
+        try:
+            self.page_archive.put(url, html, kind, library_ids, search_term)
+        except Exception as e:
+            print(f"Could not archive page {url}: {e}")
+
+    def _search_url(self, search_term: str) -> str:
+        """Build the default Ad Library keyword search URL for a term."""
+        return AdQuery(search_term).to_url()
+
+    def search_ads_fanout(self, search_term: str, url_patterns: List[str] = None, countries: List[str] = None,
+                          media_types: List[str] = None, date_ranges: List[DateRange] = None,
+                          max_workers: int = 4, as_records: bool = False, watch_words: Optional[List[str]] = None,
+                          **query_options) -> SearchResult:
+        """
+        Run one term across several countries, media types and date ranges concurrently.
+
+        Each distinct variant is fetched once; results are merged by library ID and
+        every ad lists the variants it was found under in `variants`.
+        """
+        queries = expand_queries(AdQuery(search_term, **query_options), countries, media_types, date_ranges)
+        print(f"Fanning out '{search_term}' across {len(queries)} query variants")
+        merged: Dict[str, AdRecord] = {}
+        failed = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+            futures = {pool.submit(self._search_ads_http, search_term, url_patterns, query): query
+                       for query in queries}
+            # Merge in submission order so results do not depend on completion order
+            for future, query in futures.items():
+                try:
+                    records = future.result()
+                except Exception as e:
+                    print(f"Query variant {query.label()} failed: {e}")
+                    failed.append(query.label())
                     continue
-            # Extract ad text
-            ad_text = ad_el.get_text(" ", strip=True)
-            # Extract library ID from text
-            library_id = None
-            for part in re.findall(r"\b\d{15,16}\b", ad_text):
-                library_id = part
-                break
-            # Extract first image
-            img_tag = ad_el.find("img", src=True)
-            image_url = img_tag["src"] if img_tag else None
-            collected_ads.append({
-                "urls": [original_url],
-                "original_urls": [original_url],
-                "library_id": library_id,
-                "ad_text": ad_text,
-                "library_page": original_url,
-                "image_url": image_url,
-                "ad_page_url": None
-            })
-                return collected_ads
+                for record in records:
+                    key = record.library_id or (record.urls[0] if record.urls else None)
+                    if key is None:
+                        continue
+                    existing = merged.get(key)
+                    if existing is None:
+                        record.extras = dict(record.extras or {}, variants=[query.label()])
+                        merged[key] = record
+                    elif query.label() not in existing.extras['variants']:
+                        existing.extras['variants'].append(query.label())
+        if failed and len(failed) == len(queries):
+            raise Exception(f"All {len(queries)} query variants failed for '{search_term}'")
+        records = list(merged.values())
+        return self._finish_search(search_term, records, as_records, watch_words)
+
+    @_holds_driver
+    def search_ads_capture(self, search_term: str, url_patterns: List[str] = None, target_count: int = 200,
+                           max_scrolls: int = 50, idle_scrolls: int = 3, as_records: bool = False,
+                           watch_words: Optional[List[str]] = None) -> SearchResult:
+        """
+        Search in the browser and collect ads from the Ad Library's own JSON responses.
+
+        Listens to DevTools network events while scrolling instead of querying the
+        rendered DOM. Stops as soon as the search cursor is exhausted, `target_count`
+        ads are collected, or `idle_scrolls` scrolls in a row bring no new ads.
+        """
+        if not self.capture_network:
+            raise Exception("Network capture is disabled; create the scraper with capture_network=True")
+        if not self.ensure_driver_active():
+            self.setup_driver()
+        capture = NetworkCapture(self.driver)
+        capture.start()
+        search_url = self._search_url(search_term)
+        print(f"Capturing ads from network responses: {search_url}")
+        self._driver_get(search_url)
+
+        collected: Dict[str, AdRecord] = {}
+        has_next_page = True
+
+        def absorb(bodies) -> int:
+            nonlocal has_next_page
+            added = 0
+            for body in bodies:
+                records, page_info = parse_graphql_body(body)
+                if page_info is not None:
+                    has_next_page = bool(page_info.get('has_next_page'))
+                for record in records:
+                    if record.library_id not in collected:
+                        collected[record.library_id] = record
+                        added += 1
+            return added
+
+        absorb(self.driver.execute_script(INITIAL_DATA_SCRIPT) or [])
+        absorb(capture.drain())
+        idle = 0
+        scrolls = 0
+        while has_next_page and len(collected) < target_count and scrolls < max_scrolls and idle < idle_scrolls:
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            scrolls += 1
+            # Poll for the next page's response instead of sleeping a fixed time
+            added = 0
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                time.sleep(0.25)
+                added += absorb(capture.drain())
+                if added:
+                    break
+            idle = 0 if added else idle + 1
+        if not self.quiet_mode:
+            print(f"Captured {len(collected)} ads from {capture.responses} responses in {scrolls} scrolls")
+
+        records = list(collected.values())[:target_count]
+        if url_patterns and any(url_patterns):
+            records = [r for r in records
+                       if any(self._urls_match(u, p) for u in r.urls for p in url_patterns if p)]
+        return self._finish_search(search_term, records, as_records, watch_words)
+
+    @_holds_driver
+    def search_ads_incremental(self, search_term: str, url_patterns: List[str] = None, target_count: int = 200,
+                               max_scrolls: int = 50, idle_scrolls: int = 3, batch_timeout: float = 6.0,
+                               as_records: bool = False, watch_words: Optional[List[str]] = None) -> SearchResult:
+        """
+        Search in the browser, extracting ad cards incrementally as they are inserted.
+
+        A MutationObserver queues each new card once; after every scroll only the
+        new cards are serialised and returned in a batch via execute_async_script,
+        so work grows with the number of ads rather than scrolls x page size.
+        Stops when `target_count` ads are collected or `idle_scrolls` scrolls in a
+        row bring no new cards.
+        """
+        if not self.ensure_driver_active():
+            self.setup_driver()
+        search_url = self._search_url(search_term)
+        print(f"Fetching ads incrementally: {search_url}")
+        self._driver_get(search_url)
+        self.driver.set_script_timeout(batch_timeout + 5)
+        self.driver.execute_script(INSTALL_OBSERVER_SCRIPT, AD_CARD_SELECTOR)
+
+        collected: Dict[str, AdRecord] = {}
+        cards_seen = 0
+        scrolls = 0
+        idle = 0
+        timeout_ms = int(batch_timeout * 1000)
+        try:
+            # First batch picks up the cards rendered with the page, without scrolling
+            scroll = False
+            while len(collected) < target_count and scrolls < max_scrolls and idle < idle_scrolls:
+                batch = self.driver.execute_async_script(DRAIN_BATCH_SCRIPT, scroll, timeout_ms, 400) or {}
+                if batch.get('error'):
+                    raise Exception(batch['error'])
+                if scroll:
+                    scrolls += 1
+                scroll = True
+                records = records_from_batch(batch)
+                cards_seen += len(batch.get('cards') or [])
+                added = 0
+                for record in records:
+                    if url_patterns and any(url_patterns):
+                        if not any(self._urls_match(record.urls[0], p) for p in url_patterns if p):
+                            continue
+                    key = record.library_id or record.urls[0]
+                    if key not in collected:
+                        collected[key] = record
+                        added += 1
+                idle = 0 if batch.get('cards') else idle + 1
+                if not self.quiet_mode:
+                    print(f"Batch {scrolls}: {len(batch.get('cards') or [])} new cards, {added} new ads")
+        finally:
+            try:
+                self.driver.execute_script(REMOVE_OBSERVER_SCRIPT)
+            except WebDriverException:
+                pass
+        print(f"Collected {len(collected)} ads from {cards_seen} cards in {scrolls} scrolls")
+
+        records = list(collected.values())[:target_count]
+        return self._finish_search(search_term, records, as_records, watch_words)
+
+    def _finish_search(self, search_term: str, records: List[AdRecord], as_records: bool,
+                       watch_words: Optional[List[str]] = None) -> SearchResult:
+        """Wrap one search's ads in a SearchResult and flag them against a snapshot of the watch words."""
+        words = [word.lower() for word in watch_words] if watch_words is not None else self.watch_words
+        result = SearchResult(records if as_records else [record.to_dict() for record in records],
+                              search_term, words)
+        for ad in result:
+            result.flag(ad)
+        self.flagged_ads = result.flagged_ads
+        return result
 
     def _scroll_to_load_more(self):
         """Scroll the page to load more ads."""
@@ -646,9 +941,106 @@ class FacebookAdScraper:
             print(f"Error extracting ad details: {str(e)}")
             return None
     
+    @staticmethod
+    def _classify_fetch_error(exc: Exception) -> Optional[str]:
+        """Classify fetch errors for the retry layer, including WebDriver failures."""
+        if isinstance(exc, WebDriverException):
+            return 'browser'
+        return classify_error(exc)
+
+    def _login_key(self) -> str:
+        """Sticky proxy key for this scraper's login (its browser and the session holding its cookies)."""
+        return os.getenv("FB_EMAIL") or self._anonymous_key
+
+    def _http_get(self, url: str, session=None, raise_for_status: bool = False, probe: bool = False, **kwargs):
+        """
+        Perform an HTTP GET through the shared per-host scheduler, with retries.
+        `probe=True` marks a fetch that is expected to hit the login wall at times
+        (the HTTP-first detail probe), so a login wall is not reported as throttling.
+        """
+        session = session or self.session or requests
+        use_pool = self.proxy_pool is not None and 'proxies' not in kwargs
+        sticky_key = self._login_key() if session is self.session else None
+
+        def attempt():
+            proxy = self.proxy_pool.choose(sticky_key) if use_pool else None
+            # Each egress IP is throttled separately, so each proxy has its own scheduler
+            scheduler = proxy.scheduler if proxy else self.scheduler
+            proxies = {'proxies': proxy.requests_proxies()} if proxy else {}
+            started = time.monotonic()
+            with scheduler.slot(url):
+                try:
+                    response = session.get(url, **kwargs, **proxies)
+                except requests.RequestException:
+                    scheduler.report(url, error=True)
+                    if proxy:
+                        self.proxy_pool.report(proxy, time.monotonic() - started, False)
+                    raise
+            if probe:
+                # An expected miss must not pause the host the browser fallback is about to use
+                scheduler.report(url, status_code=response.status_code,
+                                 retry_after=response.headers.get('Retry-After'))
+            else:
+                scheduler.report_response(url, response, response.text)
+            if proxy:
+                # Only 429/5xx count against the proxy; a login wall on an anonymous
+                # session is the page, not the egress IP, and says nothing about its health
+                blocked = response.status_code in THROTTLE_STATUS_CODES
+                if sticky_key is not None and not probe:
+                    blocked = blocked or looks_like_login_wall(response.url, response.text)
+                self.proxy_pool.report(proxy, time.monotonic() - started, not blocked)
+            if raise_for_status:
+                response.raise_for_status()
+            return response
+
+        return self.retrier.call(url, attempt)
+
+    def _driver_get(self, url: str):
+        """Navigate the WebDriver through the shared per-host scheduler, with retries."""
+        proxy = self.browser_proxy if self.proxy_pool else None
+        scheduler = proxy.scheduler if proxy else self.scheduler
+
+        def attempt():
+            started = time.monotonic()
+            with scheduler.slot(url):
+                try:
+                    self.driver.get(url)
+                except WebDriverException:
+                    scheduler.report(url, error=True)
+                    if proxy:
+                        self.proxy_pool.report(proxy, time.monotonic() - started, False, held=False)
+                    raise
+            login_wall = looks_like_login_wall(self.driver.current_url)
+            scheduler.report(url, login_wall=login_wall)
+            if proxy:
+                # As for HTTP: a logged-out browser meets the wall whatever its egress IP
+                ok = not (login_wall and self.logged_in)
+                self.proxy_pool.report(proxy, time.monotonic() - started, ok, held=False)
+
+        self.retrier.call(url, attempt)
+
+    def get_run_stats(self) -> Dict:
+        """Return run statistics: retry counts, time lost to retries and circuit states."""
+        return self.retrier.get_stats()
+
+    def get_detail_stats(self) -> Dict:
+        """Return the share of ad detail pages served by each tier and per-tier latency."""
+        return self.detail_stats.get_stats()
+
+    def get_rate_stats(self) -> Dict[str, Dict]:
+        """Return the live request rate and concurrency per host."""
+        return self.scheduler.get_stats()
+
+    def get_proxy_stats(self) -> Dict[str, Dict]:
+        """Return the health and share of traffic of each egress proxy (empty without a pool)."""
+        return self.proxy_pool.get_stats() if self.proxy_pool else {}
+
     def close(self):
-        """Close the WebDriver."""
+        """Close the WebDriver and release this scraper's sticky proxy."""
         self.cleanup_driver()
+        # An FB_EMAIL binding is shared by every scraper on that login and outlives this one
+        if self.proxy_pool is not None:
+            self.proxy_pool.release(self._anonymous_key)
 
     def _extract_url_from_facebook_redirect(self, url: str) -> str:
         """Extract the actual destination URL from a Facebook redirect link."""
@@ -710,49 +1102,110 @@ class FacebookAdScraper:
         
         return matching_urls
 
-    def scrape_ad_by_link(self, ad_link: str) -> Optional[Dict]:
-        """Scrape a single Facebook Ad Library ad given its URL."""
+    def scrape_ad_by_link(self, ad_link: str, as_records: bool = False) -> Optional[Dict]:
+        """
+        Scrape a single Facebook Ad Library ad given its URL.
+        Tries a pooled HTTP fetch first and only loads the page in the browser
+        when the HTTP response lacks the ad details. Returns an AdRecord with `as_records`.
+        """
+        ad = self._scrape_ad(ad_link)
+        return AdRecord.from_dict(ad) if ad and as_records else ad
+
+    def _scrape_ad(self, ad_link: str) -> Optional[Dict]:
+        if self.http_first:
+            started = time.monotonic()
+            ad = self._scrape_ad_http(ad_link)
+            self.detail_stats.record('http', time.monotonic() - started, ad is not None)
+            if ad:
+                return ad
+            if not self.quiet_mode:
+                print(f"HTTP fetch lacked ad details, escalating to browser: {ad_link}")
+        started = time.monotonic()
+        ad = self._scrape_ad_browser(ad_link)
+        self.detail_stats.record('browser', time.monotonic() - started, ad is not None)
+        return ad
+
+    def _scrape_ad_http(self, ad_link: str) -> Optional[Dict]:
+        """Fetch and parse an ad detail page without the browser; None if it needs one."""
+        # Reuse the logged-in session when there is one, otherwise a pooled anonymous session
+        session = self.session
+        if session is None:
+            with self._session_lock:
+                if self._detail_session is None:
+                    self._detail_session = pooled_session()
+                session = self._detail_session
+        try:
+            response = self._http_get(ad_link, session=session, probe=True, timeout=15,
+                                      headers=self.http_headers)
+        except Exception as e:
+            if not self.quiet_mode:
+                print(f"HTTP fetch failed for {ad_link}: {e}")
+            return None
+        if response.status_code != 200 or looks_like_login_wall(response.url, response.text):
+            return None
+        # Archived before parsing, so a page the parser no longer understands can be re-extracted
+        self._archive_page(ad_link, response.text, 'detail', [library_id_from_link(ad_link)])
+        return parse_detail_html(response.text, ad_link)
+
+    @_holds_driver
+    def _scrape_ad_browser(self, ad_link: str) -> Optional[Dict]:
+        """Load an ad detail page in the browser and extract it from the rendered DOM."""
         # Ensure WebDriver is ready
         if not self.ensure_driver_active():
             self.setup_driver()
+        library_id = library_id_from_link(ad_link)
+        loaded = False
         try:
             # Navigate to the ad link
-            self.driver.get(ad_link)
-            time.sleep(5)  # Wait for the page to load
+            self._driver_get(ad_link)
+            loaded = True
             # Wait for the ad container to appear
             ad_element = WebDriverWait(self.driver, 20).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, "div[role='article']"))
             )
             # Extract ad text
             ad_text = ad_element.text or ""
-            # Parse library ID from the URL query parameters
-            parsed = urlparse(ad_link)
-            params = parse_qs(parsed.query)
-            library_id = params.get('id', [None])[0]
             # Extract image URL
             image_url = self._extract_image_url(ad_element)
+            # The ad's own link out; `urls` holds the Ad Library link for detail pages
+            destination_url = pick_destination(a.get_attribute('href')
+                                               for a in ad_element.find_elements(By.CSS_SELECTOR, "a[href]"))
             # Build ad info dictionary
-            return {
+            ad = {
                 'ad_text': ad_text,
                 'library_id': library_id,
                 'urls': [ad_link],
                 'original_urls': [ad_link],
                 'library_page': ad_link,
                 'image_url': image_url,
-                'ad_page_url': ad_link
+                'ad_page_url': ad_link,
+                'destination_url': destination_url,
             }
+            return ad
         except Exception as e:
             print(f"Error scraping ad by link {ad_link}: {e}")
             return None
+        finally:
+            if loaded and self.page_archive is not None:
+                # The rendered DOM whether or not extraction worked, so a broken selector can be re-run on it
+                try:
+                    html = self.driver.page_source
+                except WebDriverException:
+                    html = None
+                self._archive_page(ad_link, html, 'detail', [library_id])
 
     def _init_http_session(self):
         """Initialize an HTTP session using cookies from the Selenium driver."""
+        with self._session_lock, self._driver_lock:
+            return self._init_http_session_locked()
+
+    def _init_http_session_locked(self):
         if not self.session:
             # Ensure WebDriver is active for cookie extraction
             if not self.ensure_driver_active():
                 self.setup_driver()
                 self.login_to_facebook()
-            self.session = requests.Session()
+            self.session = pooled_session()
             # Transfer cookies from Selenium to requests, with retry on stale driver
             try:
                 selenium_cookies = self.driver.get_cookies()
@@ -772,7 +1225,7 @@ class FacebookAdScraper:
             self.http_headers = {"User-Agent": ua}
         return self.session
 
-def main():
+def main(profile: bool = False):
     # Example usage
     scraper = None
     try:
@@ -782,7 +1235,8 @@ def main():
         search_term = input("Enter search term (e.g., commercecrunch.com): ")
         print(f"Starting search for term: {search_term}")
         # Directly perform the ad library search without manual filter selection
-        ads = scraper.search_ads(search_term)
+        with profile_job(f"search-{search_term}", enabled=profile):
+            ads = scraper.search_ads(search_term)
         
         if not ads:
             print("\nNo ads found.")
@@ -900,6 +1354,10 @@ def main():
                 print("-" * 50)
             
             print(f"\nTotal Flagged Ads: {len(scraper.flagged_ads)}")
+
+        # Report how much the run lost to transient failures
+        run_stats = scraper.get_run_stats()
+        print(f"\nRetries: {run_stats['retries']} ({run_stats['retry_time_lost']}s lost to retries)")
         
         # Keep the window open until user chooses to close
         input("\nPress Enter when you want to close the browser window...")
@@ -916,4 +1374,4 @@ def main():
             scraper.close()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main(profile="--profile" in sys.argv)
@@ -0,0 +1,160 @@
+import base64
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ad_record import AdRecord
+
+# Ad Library endpoints whose JSON responses carry search results
+CAPTURE_URL_MARKERS = ("/api/graphql", "/ads/library/async/search_ads")
+
+
+def _json_documents(body: str) -> Iterator:
+    """Yield every JSON document in a response body (Facebook streams several per response)."""
+    if body.startswith("for (;;);"):
+        body = body[len("for (;;);"):]
+    decoder = json.JSONDecoder()
+    position = 0
+    length = len(body)
+    while position < length:
+        while position < length and body[position] in " \r\n\t":
+            position += 1
+        if position >= length:
+            break
+        try:
+            document, position = decoder.raw_decode(body, position)
+        except ValueError:
+            return
+        yield document
+
+
+def _walk(node) -> Iterator[Dict]:
+    """Iterate over every dict nested in a JSON document."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            stack.extend(current)
+
+
+def _first_image(snapshot: Dict) -> Optional[str]:
+    for image in snapshot.get('images') or []:
+        url = image.get('original_image_url') or image.get('resized_image_url')
+        if url:
+            return url
+    for video in snapshot.get('videos') or []:
+        url = video.get('video_preview_image_url')
+        if url:
+            return url
+    for card in snapshot.get('cards') or []:
+        url = card.get('original_image_url') or card.get('resized_image_url') or card.get('video_preview_image_url')
+        if url:
+            return url
+    return None
+
+
+def record_from_node(node: Dict) -> Optional[AdRecord]:
+    """Build an AdRecord from a GraphQL search result node carrying an `ad_archive_id`."""
+    library_id = node.get('ad_archive_id')
+    if not library_id:
+        return None
+    snapshot = node.get('snapshot') or {}
+    body = snapshot.get('body') or {}
+    text_parts = [
+        snapshot.get('page_name'),
+        body.get('text') if isinstance(body, dict) else body,
+        snapshot.get('title'),
+        snapshot.get('link_description'),
+        snapshot.get('cta_text'),
+    ]
+    cards = snapshot.get('cards') or []
+    for card in cards:
+        text_parts.append(card.get('body'))
+    link_url = snapshot.get('link_url') or next((c.get('link_url') for c in cards if c.get('link_url')), None)
+    urls = (link_url,) if link_url else ()
+    return AdRecord(
+        library_id=str(library_id),
+        ad_text=" ".join(str(p) for p in text_parts if p),
+        urls=urls,
+        library_page=f"https://www.facebook.com/ads/library/?id={library_id}",
+        image_url=_first_image(snapshot),
+        ad_page_url=snapshot.get('page_profile_uri'),
+    )
+
+
+def parse_graphql_body(body: str) -> Tuple[List[AdRecord], Optional[Dict]]:
+    """
+    Extract ad records and the search cursor from one captured response body.
+    Returns (records, page_info) where page_info has `has_next_page`/`end_cursor` if present.
+    """
+    records: List[AdRecord] = []
+    page_info = None
+    for document in _json_documents(body):
+        for node in _walk(document):
+            if 'ad_archive_id' in node and ('snapshot' in node or 'collation_id' in node):
+                record = record_from_node(node)
+                if record:
+                    records.append(record)
+            elif 'has_next_page' in node and 'end_cursor' in node:
+                page_info = node
+    return records, page_info
+
+
+# Initial results are server-rendered into JSON script tags rather than fetched by XHR
+INITIAL_DATA_SCRIPT = """
+return Array.from(document.querySelectorAll('script[type="application/json"]'))
+    .map(s => s.textContent)
+    .filter(t => t.indexOf('ad_archive_id') !== -1);
+"""
+
+
+class NetworkCapture:
+    """
+    Collect Ad Library JSON responses from Chrome DevTools network events.
+
+    Requires a driver started with the `performance` log enabled (see
+    FacebookAdScraper(capture_network=True)). `drain()` reads the pending
+    `Network.responseReceived`/`Network.loadingFinished` events and fetches
+    bodies for matching requests with `Network.getResponseBody`.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._pending: Dict[str, str] = {}
+        self.responses = 0
+
+    def start(self):
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        # Discard events from before the capture started
+        self.driver.get_log("performance")
+
+    def drain(self) -> List[str]:
+        """Return the bodies of matching responses that finished loading since the last call."""
+        bodies = []
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+            if method == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if any(marker in url for marker in CAPTURE_URL_MARKERS):
+                    self._pending[params["requestId"]] = url
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                request_id = params["requestId"]
+                self._pending.pop(request_id, None)
+                try:
+                    result = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                except Exception as e:
+                    print(f"Could not read captured response body: {e}")
+                    continue
+                body = result.get("body", "")
+                if result.get("base64Encoded"):
+                    body = base64.b64decode(body).decode("utf-8", errors="replace")
+                self.responses += 1
+                bodies.append(body)
+        return bodies
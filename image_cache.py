@@ -0,0 +1,195 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from ad_record import annotate
+from rate_limiter import FetchScheduler, get_default_scheduler
+
+try:
+    from PIL import Image
+except ImportError:  # Perceptual hashing is optional
+    Image = None
+
+
+def dhash(data: bytes, hash_size: int = 8) -> Optional[str]:
+    """Return a 64-bit difference hash of image bytes as hex, or None if Pillow is unavailable."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            pixels = list(img.convert("L").resize((hash_size + 1, hash_size)).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:016x}"
+
+
+def hamming(hash1: str, hash2: str) -> int:
+    """Return the bit distance between two hex perceptual hashes."""
+    return bin(int(hash1, 16) ^ int(hash2, 16)).count("1")
+
+
+def group_by_phash(records: List[Dict], max_distance: int = 3) -> List[List[Dict]]:
+    """
+    Group records with an `image_phash` into visual-duplicate groups.
+
+    Hashes are split into max_distance + 1 bands; by pigeonhole, any two hashes
+    within `max_distance` bits share at least one band, so only records in a
+    shared band bucket are compared.
+    """
+    hashed = [r for r in records if r.get('image_phash')]
+    parent = list(range(len(hashed)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    bands = max_distance + 1
+    width = 64 // bands
+    buckets: Dict[tuple, List[int]] = {}
+    for i, record in enumerate(hashed):
+        value = int(record['image_phash'], 16)
+        for band in range(bands):
+            key = (band, (value >> (band * width)) & ((1 << width) - 1))
+            for j in buckets.setdefault(key, []):
+                if find(i) != find(j) and hamming(record['image_phash'], hashed[j]['image_phash']) <= max_distance:
+                    parent[find(i)] = find(j)
+            buckets[key].append(i)
+
+    groups: Dict[int, List[Dict]] = {}
+    for i, record in enumerate(hashed):
+        groups.setdefault(find(i), []).append(record)
+    return list(groups.values())
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache of ad creatives.
+
+    Image bytes are stored under objects/<sha[:2]>/<sha256>, and index.json maps
+    each source URL to its digest and perceptual hash so URLs already fetched
+    are never downloaded again, and creatives shared across library IDs are
+    stored once.
+    """
+
+    def __init__(self, cache_dir: str = "image_cache", max_workers: int = 8,
+                 scheduler: Optional[FetchScheduler] = None, timeout: int = 20):
+        self.cache_dir = Path(cache_dir)
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "index.json"
+        self.max_workers = max_workers
+        self.scheduler = scheduler or get_default_scheduler()
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self.index: Dict[str, Dict] = {}
+        if self.index_path.exists():
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def path_for(self, url: str) -> Optional[Path]:
+        """Return the cached file for a URL, if it has been downloaded."""
+        entry = self.index.get(url)
+        return self._object_path(entry['sha256']) if entry else None
+
+    def _download(self, url: str) -> Optional[Dict]:
+        with self.scheduler.slot(url):
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.scheduler.report(url, error=True)
+                print(f"Error downloading image {url}: {e}")
+                return None
+        self.scheduler.report_response(url, response)
+        if response.status_code != 200:
+            return None
+        data = response.content
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return {'sha256': digest, 'phash': dhash(data), 'bytes': len(data),
+                'content_type': response.headers.get('Content-Type')}
+
+    def fetch_many(self, urls: Iterable[str]) -> Dict:
+        """
+        Download every uncached URL with bounded concurrency.
+        Returns {'entries': {url: entry}, 'stats': {...}} with throughput and hit rate.
+        """
+        unique_urls = list(dict.fromkeys(u for u in urls if u))
+        entries: Dict[str, Dict] = {}
+        to_fetch = []
+        for url in unique_urls:
+            if url in self.index and self._object_path(self.index[url]['sha256']).exists():
+                entries[url] = self.index[url]
+            else:
+                to_fetch.append(url)
+
+        started = time.monotonic()
+        downloaded_bytes = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for url, entry in zip(to_fetch, pool.map(self._download, to_fetch)):
+                if entry is None:
+                    failed += 1
+                    continue
+                downloaded_bytes += entry['bytes']
+                entries[url] = entry
+                with self._lock:
+                    self.index[url] = entry
+        elapsed = time.monotonic() - started
+        if to_fetch:
+            self.save_index()
+
+        hits = len(unique_urls) - len(to_fetch)
+        stats = {
+            'urls': len(unique_urls),
+            'cache_hits': hits,
+            'downloaded': len(to_fetch) - failed,
+            'failed': failed,
+            'hit_rate': round(hits / len(unique_urls), 3) if unique_urls else 0.0,
+            'seconds': round(elapsed, 2),
+            'images_per_sec': round((len(to_fetch) - failed) / elapsed, 2) if elapsed > 0 else 0.0,
+            'mb_per_sec': round(downloaded_bytes / 1e6 / elapsed, 3) if elapsed > 0 else 0.0,
+        }
+        return {'entries': entries, 'stats': stats}
+
+    def attach_images(self, ads: List[Dict]) -> Dict:
+        """Fetch the creatives for a list of ads (dicts or AdRecords) and annotate them with digest and perceptual hash."""
+        result = self.fetch_many(ad.get('image_url') for ad in ads)
+        for ad in ads:
+            entry = result['entries'].get(ad.get('image_url'))
+            if entry:
+                annotate(ad, 'image_sha256', entry['sha256'])
+                annotate(ad, 'image_phash', entry['phash'])
+        return result['stats']
+
+    def save_index(self):
+        """Atomically persist the URL index."""
+        with self._lock:
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
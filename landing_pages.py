@@ -0,0 +1,285 @@
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlunparse
+
+import requests
+from bs4 import BeautifulSoup
+
+from ad_record import annotate
+from rate_limiter import FetchScheduler
+
+# Query parameters that only identify the click or campaign, never the page content
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'msclkid', 'fbid', 'fbclick', 'click_track_url', 'search_track_url',
+    's1pcid', 's1pagid', 's1padid', 's1pplacement', 's1paid', 'campaign_id', 'adgroup_id', 'creative_id',
+}
+INVISIBLE_TAGS = ('script', 'style', 'noscript', 'template', 'svg', 'head', 'iframe')
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def normalize_destination(url: Optional[str]) -> Optional[str]:
+    """
+    Return the canonical landing URL used as the cache key: Facebook l.php
+    redirects unwrapped, host lower-cased, fragment and tracking parameters
+    dropped and the remaining parameters sorted. Facebook's own pages (the Ad
+    Library, advertiser pages) are not landing pages and give None.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url.strip())
+    if parsed.netloc.lower().endswith("facebook.com") and parsed.path == "/l.php":
+        target = dict(parse_qsl(parsed.query)).get('u')
+        if not target:
+            return None
+        parsed = urlparse(unquote(target))
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        return None
+    host = parsed.hostname or ""
+    if host == "facebook.com" or host.endswith(".facebook.com"):
+        return None
+    params = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+                    if k.lower() not in TRACKING_PARAMS and not k.lower().startswith('utm_'))
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or "/", "", urlencode(params), ""))
+
+
+def pick_destination(hrefs: Iterable[Optional[str]]) -> Optional[str]:
+    """Return the first link that leads off Facebook (l.php redirects included), as found."""
+    for href in hrefs:
+        if normalize_destination(href):
+            return href
+    return None
+
+
+def ad_destination(ad) -> Optional[str]:
+    """
+    The normalised landing page of an ad: its `destination_url` (set for detail
+    pages, whose `urls` hold the Ad Library link), else its first link.
+    """
+    url = ad.get('destination_url')
+    if not url:
+        urls = ad.get('original_urls') or ad.get('urls') or []
+        url = urls[0] if urls else None
+    return normalize_destination(url)
+
+
+def visible_text(html: str) -> str:
+    """Extract the human-visible text of a page."""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(INVISIBLE_TAGS):
+        tag.decompose()
+    return re.sub(r"\s+", " ", soup.get_text(" ")).strip()
+
+
+def scan_text(text: str, watch_words: Iterable[str]) -> List[str]:
+    text_lower = (text or "").lower()
+    return [word for word in watch_words if word and word.lower() in text_lower]
+
+
+def _ok(entry: Dict) -> bool:
+    return not entry['error'] and entry['status'] == 200
+
+
+class LandingPageCrawler:
+    """
+    Fetch ad landing pages once per TTL and scan their visible text for watch words.
+
+    Results are cached by normalised destination, so thousands of ads sharing a
+    landing page cost one fetch; concurrent requests for the same destination
+    wait on the fetch already in flight. Bodies are streamed and cut off at
+    `max_bytes`. With `cache_dir`, entries are also kept on disk (gzip JSON).
+    Failed fetches are only remembered in memory, for `error_ttl_seconds`.
+    At most `max_entries` entries are held in memory (least recently used evicted).
+    Landing pages get their own scheduler by default, so a slow or throttling
+    advertiser site never paces (or pauses) the Ad Library scraper.
+    """
+
+    def __init__(self, ttl_seconds: int = 24 * 3600, max_workers: int = 8, max_bytes: int = 2 * 1024 * 1024,
+                 timeout: int = 15, scheduler: Optional[FetchScheduler] = None, cache_dir: Optional[str] = None,
+                 max_text_chars: int = 100000, error_ttl_seconds: int = 300, max_entries: int = 2000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.error_ttl_seconds = error_ttl_seconds
+        self.max_workers = max_workers
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_text_chars = max_text_chars
+        self.scheduler = scheduler or FetchScheduler()
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self.stats = {'requests': 0, 'cache_hits': 0, 'fetched': 0, 'failed': 0, 'truncated': 0,
+                      'fetch_seconds': 0.0}
+
+    def _disk_path(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.json.gz"
+
+    def _cached(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None and self.cache_dir:
+            path = self._disk_path(key)
+            if path.exists():
+                try:
+                    with gzip.open(path, "rt", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    entry = None
+        if entry is None:
+            return None
+        if time.time() - entry['fetched_at'] >= (self.ttl_seconds if _ok(entry) else self.error_ttl_seconds):
+            self._entries.pop(key, None)
+            return None
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Dict):
+        """Keep an entry in memory, evicting the least recently used beyond max_entries."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _fetch(self, key: str) -> Dict:
+        started = time.monotonic()
+        entry = {'url': key, 'final_url': None, 'status': None, 'text': "", 'bytes': 0,
+                 'truncated': False, 'error': None, 'fetched_at': time.time()}
+        try:
+            with self.scheduler.slot(key):
+                try:
+                    response = self.session.get(key, timeout=self.timeout, stream=True, allow_redirects=True)
+                except requests.RequestException:
+                    self.scheduler.report(key, error=True)
+                    raise
+                try:
+                    entry['status'] = response.status_code
+                    entry['final_url'] = response.url
+                    chunks, size = [], 0
+                    for chunk in response.iter_content(65536):
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size >= self.max_bytes:
+                            entry['truncated'] = True
+                            break
+                finally:
+                    response.close()
+            # Status only: a landing page redirecting to a Facebook login is not the scraper being walled
+            self.scheduler.report(key, status_code=response.status_code,
+                                  retry_after=response.headers.get('Retry-After'))
+            body = b"".join(chunks)[:self.max_bytes]
+            entry['bytes'] = len(body)
+            content_type = response.headers.get('Content-Type', '')
+            if response.status_code == 200 and ('html' in content_type or 'text' in content_type or not content_type):
+                html = body.decode(response.encoding or 'utf-8', errors='replace')
+                entry['text'] = visible_text(html)[:self.max_text_chars]
+        except Exception as e:
+            entry['error'] = str(e)
+        with self._lock:
+            self.stats['fetch_seconds'] += time.monotonic() - started
+            self.stats['fetched' if _ok(entry) else 'failed'] += 1
+            if entry['truncated']:
+                self.stats['truncated'] += 1
+            self._remember(key, entry)
+        if self.cache_dir and _ok(entry):
+            path = self._disk_path(key)
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(entry, f)
+            tmp_path.replace(path)
+        return entry
+
+    def get(self, url: str, pool: Optional[ThreadPoolExecutor] = None) -> Optional[Future]:
+        """Return a future for the landing page entry of `url` (shared with any fetch in flight)."""
+        key = normalize_destination(url)
+        if key is None:
+            return None
+        with self._lock:
+            self.stats['requests'] += 1
+            entry = self._cached(key)
+            if entry is not None:
+                self.stats['cache_hits'] += 1
+                future = Future()
+                future.set_result(entry)
+                return future
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats['cache_hits'] += 1
+                return future
+            if pool is None:
+                future = Future()
+            else:
+                future = pool.submit(self._fetch, key)
+            self._inflight[key] = future
+        if pool is None:
+            future.set_result(self._fetch(key))
+        future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def scan_ads(self, ads: List[Dict], watch_words: Iterable[str]) -> Dict:
+        """
+        Scan the landing page of every ad (dicts or AdRecords) for watch words.
+        Sets `landing_url` on ads whose landing page was fetched, and
+        `landing_matched_words` on those whose page matches; when `ads` is a SearchResult those ads are added to its flagged_ads.
+        """
+        watch_words = [w.lower() for w in watch_words if w]
+        started = time.monotonic()
+        keys = [ad_destination(ad) for ad in ads]
+        destinations = dict.fromkeys(key for key in keys if key)
+        # Ads sharing a destination are served by its one lookup; count them as hits
+        shared = sum(1 for key in keys if key) - len(destinations)
+        with self._lock:
+            self.stats['requests'] += shared
+            self.stats['cache_hits'] += shared
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for key in destinations:
+                destinations[key] = self.get(key, pool)
+            entries = {key: future.result() for key, future in destinations.items()}
+        flagged = 0
+        for ad, key in zip(ads, keys):
+            entry = entries.get(key) if key else None
+            if not entry or not _ok(entry):
+                continue
+            annotate(ad, 'landing_url', entry['final_url'] or entry['url'])
+            matched = scan_text(entry['text'], watch_words)
+            if matched:
+                annotate(ad, 'landing_matched_words', matched)
+                flagged += 1
+                if hasattr(ads, 'flagged_ads'):
+                    ads.flagged_ads.append({
+                        'matched_words': matched,
+                        'ad_text': ad.get('ad_text'),
+                        'library_id': ad.get('library_id'),
+                        'library_page': ad.get('library_page'),
+                        'urls': ad.get('urls', []),
+                        'landing_url': entry['final_url'] or entry['url'],
+                    })
+        return {
+            'ads': len(ads),
+            'destinations': len(entries),
+            'flagged': flagged,
+            'seconds': round(time.monotonic() - started, 2),
+        }
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['hit_rate'] = round(stats['cache_hits'] / stats['requests'], 3) if stats['requests'] else 0.0
+        fetches = stats['fetched'] + stats['failed']
+        stats['avg_fetch_seconds'] = round(stats['fetch_seconds'] / fetches, 3) if fetches else 0.0
+        stats['fetch_seconds'] = round(stats['fetch_seconds'], 2)
+        return stats
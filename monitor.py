@@ -0,0 +1,238 @@
+"""
+Long-running monitor that re-runs saved searches on a schedule and only emits changes.
+
+Saved searches live in a JSON file, e.g. monitor.json:
+    [
+        {"name": "internet-seniors", "term": "internet", "patterns_file": "target_urls.txt",
+         "interval_minutes": 180}
+    ]
+
+Run with:
+    python monitor.py --config monitor.json --events events.ndjson
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from facebook_ad_scraper import FacebookAdScraper
+from profiling import profile_job
+from seen_set import SeenSet, ad_seen_key
+
+
+def ad_fingerprint(ad: Dict) -> str:
+    """Return a short content hash of the fields that make an ad 'changed'."""
+    content = json.dumps([ad.get('ad_text'), ad.get('urls'), ad.get('image_url')], sort_keys=True)
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+def ad_key(ad: Dict) -> str:
+    """Identify an ad by library ID, falling back to its content for ads without one."""
+    return ad.get('library_id') or f"fp:{ad_fingerprint(ad)}"
+
+
+def diff_snapshot(previous: Dict[str, str], ads: List[Dict]) -> Tuple[List[Dict], List[Dict], List[str], Dict[str, str]]:
+    """
+    Compare a run against the previous snapshot.
+    Returns (new_ads, changed_ads, disappeared_ids, current_snapshot).
+    """
+    current: Dict[str, str] = {}
+    new_ads, changed_ads = [], []
+    for ad in ads:
+        key = ad_key(ad)
+        if key in current:
+            continue
+        fingerprint = ad_fingerprint(ad)
+        current[key] = fingerprint
+        if key not in previous:
+            new_ads.append(ad)
+        elif previous[key] != fingerprint:
+            changed_ads.append(ad)
+    disappeared = [key for key in previous if key not in current]
+    return new_ads, changed_ads, disappeared, current
+
+
+class SnapshotStore:
+    """Compact per-search snapshots: gzip'd JSON maps of ad key -> content fingerprint."""
+
+    def __init__(self, directory: str = "snapshots"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name: str) -> Path:
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        return self.directory / f"{safe_name}.json.gz"
+
+    def load(self, name: str) -> Optional[Dict[str, str]]:
+        path = self._path(name)
+        if not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, name: str, snapshot: Dict[str, str]):
+        path = self._path(name)
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+
+class Monitor:
+    """Run saved searches on their intervals, diff against snapshots and emit change events."""
+
+    def __init__(self, searches: List[Dict], store: SnapshotStore, emit, scraper: Optional[FacebookAdScraper] = None,
+                 profile_dir: Optional[str] = None, seen: Optional[SeenSet] = None):
+        self.searches = searches
+        self.store = store
+        self.emit = emit
+        self.scraper = scraper
+        # When set, every search run is profiled into this directory
+        self.profile_dir = profile_dir
+        # Every ad any saved search has reported, so "new" events can say whether it was seen before
+        self.seen = seen if seen is not None else SeenSet(str(store.directory / "seen"))
+        self._stop = threading.Event()
+        self._next_run = {s['name']: 0.0 for s in searches}
+
+    def stop(self):
+        self._stop.set()
+
+    def _get_scraper(self) -> FacebookAdScraper:
+        if self.scraper is None:
+            self.scraper = FacebookAdScraper(quiet_mode=True)
+        return self.scraper
+
+    def run_search(self, search: Dict) -> Dict:
+        """Run one saved search, emit its changes and update its snapshot."""
+        with profile_job(f"monitor-{search['name']}", self.profile_dir, enabled=self.profile_dir is not None):
+            return self._run_search(search)
+
+    def _run_search(self, search: Dict) -> Dict:
+        scraper = self._get_scraper()
+        patterns = list(search.get('patterns') or [])
+        if search.get('patterns_file'):
+            with open(search['patterns_file'], "r", encoding="utf-8") as f:
+                patterns += [line.strip() for line in f if line.strip()]
+
+        started = time.monotonic()
+        # Watch words are passed per call so saved searches sharing the scraper don't clobber each other
+        ads = scraper.search_ads(search['term'], patterns, watch_words=search.get('watch_words'))
+        previous = self.store.load(search['name'])
+        min_results = int(search.get('min_results', 1))
+        if previous and len(ads) < min_results:
+            # A blocked or broken run would otherwise report every ad as disappeared, then new again next run
+            print(f"Saved search {search['name']} returned {len(ads)} ads (min_results {min_results}); "
+                  f"keeping the previous snapshot", file=sys.stderr)
+            return {'search': search['name'], 'ads': len(ads), 'new': 0, 'seen_before': 0, 'changed': 0,
+                    'disappeared': 0, 'baseline': False, 'skipped': True,
+                    'seconds': round(time.monotonic() - started, 2)}
+        new_ads, changed_ads, disappeared, current = diff_snapshot(previous or {}, ads)
+        timestamp = datetime.now().isoformat()
+
+        # New to this search, but possibly reported earlier by another search or before disappearing
+        seen_before = self.seen.check_and_add_many(ad_seen_key(ad) for ad in new_ads)
+        # Only the delta is emitted; unchanged ads cost nothing beyond the fetch
+        for ad, was_seen in zip(new_ads, seen_before):
+            self.emit({'search': search['name'], 'change': 'new', 'at': timestamp, 'ad': ad, 'seen_before': was_seen})
+        for ad in changed_ads:
+            self.emit({'search': search['name'], 'change': 'changed', 'at': timestamp, 'ad': ad})
+        for key in disappeared:
+            self.emit({'search': search['name'], 'change': 'disappeared', 'at': timestamp, 'library_id': key})
+
+        self.store.save(search['name'], current)
+        self.seen.save()
+        summary = {
+            'search': search['name'],
+            'ads': len(current),
+            'new': len(new_ads),
+            'seen_before': sum(seen_before),
+            'changed': len(changed_ads),
+            'disappeared': len(disappeared),
+            'baseline': previous is None,
+            'skipped': False,
+            'seconds': round(time.monotonic() - started, 2),
+        }
+        seen_stats = self.seen.get_stats()
+        print(json.dumps({'cycle': summary, 'seen_set': {key: seen_stats[key] for key in
+                                                         ('items', 'memory_bytes', 'estimated_fpr')}}),
+              file=sys.stderr)
+        return summary
+
+    def run_due(self) -> List[Dict]:
+        """Run every search whose interval has elapsed."""
+        summaries = []
+        for search in self.searches:
+            if self._stop.is_set():
+                break
+            if time.monotonic() < self._next_run[search['name']]:
+                continue
+            try:
+                summaries.append(self.run_search(search))
+            except Exception as e:
+                print(f"Error running saved search {search['name']}: {e}", file=sys.stderr)
+            self._next_run[search['name']] = time.monotonic() + float(search.get('interval_minutes', 60)) * 60
+        return summaries
+
+    def run_forever(self):
+        """Loop until stopped, sleeping until the next search is due."""
+        while not self._stop.is_set():
+            self.run_due()
+            wait = min(self._next_run.values()) - time.monotonic() if self._next_run else 60
+            self._stop.wait(max(1.0, wait))
+
+    def close(self):
+        self.seen.close()
+        if self.scraper:
+            self.scraper.close()
+            self.scraper = None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Monitor saved Ad Library searches and emit only changes.")
+    parser.add_argument('--config', required=True, help="JSON file with the saved searches")
+    parser.add_argument('--snapshots', default="snapshots", help="Directory for compact run snapshots")
+    parser.add_argument('--events', default='-', help="NDJSON file to append change events to, or '-' for stdout")
+    parser.add_argument('--once', action='store_true', help="Run every search once and exit (for cron)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile each search run (cProfile, stack samples, tracemalloc)")
+    parser.add_argument('--profile-dir', default="profiles", help="Directory for --profile reports")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        searches = json.load(f)
+    out = sys.stdout if args.events == '-' else open(args.events, "a", encoding="utf-8")
+
+    def emit(event):
+        out.write(json.dumps(event, default=str) + "\n")
+        out.flush()
+
+    monitor = Monitor(searches, SnapshotStore(args.snapshots), emit,
+                      profile_dir=args.profile_dir if args.profile else None)
+    signal.signal(signal.SIGTERM, lambda *_: monitor.stop())
+    try:
+        # Scraper progress output goes to stderr so stdout carries only events
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.once:
+                monitor.run_due()
+            else:
+                monitor.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Compressed archive of raw Ad Library pages.
+
+Every archived search or detail page is compressed on its own and appended to
+a segment file, so any single page can be read back with one seek. A small
+SQLite index maps library IDs and fetch times to (segment, offset, length).
+Pages are compressed with zstd using a dictionary trained on the first pages
+of the archive (pages share most of their markup, so the dictionary does most
+of the work); without the optional `zstandard` package zlib with a preset
+dictionary is used instead.
+
+Re-run the current parsers over the archive without refetching anything:
+
+    python page_archive.py reextract --archive page_archive --processes 8 --output ads.ndjson
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is used instead
+    zstandard = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    page_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    search_term TEXT,
+    fetched_at TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_size INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    dict_id TEXT
+);
+CREATE TABLE IF NOT EXISTS page_ads (
+    page_id INTEGER NOT NULL,
+    library_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+CREATE INDEX IF NOT EXISTS page_ads_library_id ON page_ads (library_id);
+CREATE INDEX IF NOT EXISTS page_ads_page_id ON page_ads (page_id);
+"""
+
+DICT_SIZE = 112 * 1024
+# zlib preset dictionaries are limited to the 32 KiB window
+ZLIB_DICT_SIZE = 32 * 1024
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _dict_path(root: Path, dict_id: str) -> Path:
+    return root / f"dict-{dict_id}.bin"
+
+
+class _Codec:
+    """Compress/decompress pages with one codec and (optionally) one dictionary."""
+
+    def __init__(self, codec: str, dictionary: Optional[bytes] = None, level: int = 9):
+        self.codec = codec
+        self.dictionary = dictionary
+        if codec == "zstd":
+            if zstandard is None:
+                raise Exception("Archive uses zstd but the zstandard package is not installed")
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            self._compressor = zstandard.ZstdCompressor(level=level, dict_data=zdict)
+            self._decompressor = zstandard.ZstdDecompressor(dict_data=zdict)
+        elif codec != "zlib":
+            raise Exception(f"Unknown archive codec '{codec}'")
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._compressor.compress(data)
+        compressor = zlib.compressobj(self.level, zdict=self.dictionary) if self.dictionary \
+            else zlib.compressobj(self.level)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return self._decompressor.decompress(data)
+        decompressor = zlib.decompressobj(zdict=self.dictionary) if self.dictionary else zlib.decompressobj()
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+def train_dictionary(samples: List[bytes], codec: str) -> bytes:
+    """Build a compression dictionary from sample pages."""
+    if codec == "zstd":
+        return zstandard.train_dictionary(DICT_SIZE, samples).as_bytes()
+    # zlib has no trainer: use the tail of the concatenated samples, where shared markup recurs
+    return b"".join(samples)[-ZLIB_DICT_SIZE:]
+
+
+class PageArchive:
+    """
+    Append-only archive of raw page HTML in compressed segment files.
+
+    The first `train_after` pages are stored without a dictionary and kept as
+    training samples; after that a dictionary is trained, saved next to the
+    segments and used for every later page. Segments roll over at
+    `segment_bytes`.
+    """
+
+    def __init__(self, root: str = "page_archive", segment_bytes: int = 64 * 1024 * 1024,
+                 train_after: int = 64, codec: Optional[str] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.train_after = train_after
+        self.codec = codec or default_codec()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "index.db"), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._codecs: Dict[Tuple[str, Optional[str]], _Codec] = {}
+        self._samples: List[bytes] = []
+        self._dict_id = self._latest_dict_id()
+        self._segment = None
+        self._segment_name: Optional[str] = None
+
+    def _latest_dict_id(self) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT dict_id FROM pages WHERE dict_id IS NOT NULL AND codec = ? ORDER BY page_id DESC LIMIT 1",
+            (self.codec,)
+        ).fetchone()
+        return row['dict_id'] if row else None
+
+    def _codec_for(self, codec: str, dict_id: Optional[str]) -> _Codec:
+        key = (codec, dict_id)
+        if key not in self._codecs:
+            dictionary = _dict_path(self.root, dict_id).read_bytes() if dict_id else None
+            self._codecs[key] = _Codec(codec, dictionary)
+        return self._codecs[key]
+
+    def _maybe_train(self, raw: bytes):
+        if self._dict_id or self.train_after <= 0:
+            return
+        self._samples.append(raw)
+        if len(self._samples) < self.train_after:
+            return
+        try:
+            dictionary = train_dictionary(self._samples, self.codec)
+        except Exception as e:
+            print(f"Could not train page archive dictionary: {e}")
+            self._samples = []
+            return
+        dict_id = hashlib.sha256(dictionary).hexdigest()[:16]
+        _dict_path(self.root, dict_id).write_bytes(dictionary)
+        self._dict_id = dict_id
+        self._samples = []
+
+    def _segment_file(self):
+        if self._segment is None or self._segment.tell() >= self.segment_bytes:
+            if self._segment is not None:
+                self._segment.close()
+            # One writer per segment: the PID and a random suffix keep processes apart
+            self._segment_name = f"segment-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}-" \
+                                 f"{uuid.uuid4().hex[:6]}.seg"
+            self._segment = open(self.root / self._segment_name, "ab")
+        return self._segment
+
+    def put(self, url: str, html: str, kind: str, library_ids: Iterable[str] = (),
+            search_term: Optional[str] = None, fetched_at: Optional[datetime] = None) -> int:
+        """Compress and append one page; returns its page ID."""
+        raw = html.encode("utf-8")
+        fetched_at = (fetched_at or datetime.now()).isoformat(timespec="seconds")
+        with self._lock:
+            dict_id = self._dict_id
+            data = self._codec_for(self.codec, dict_id).compress(raw)
+            segment = self._segment_file()
+            offset = segment.seek(0, os.SEEK_END)
+            segment.write(data)
+            segment.flush()
+            cursor = self._conn.execute(
+                "INSERT INTO pages (kind, url, search_term, fetched_at, segment, offset, length, raw_size, codec, dict_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, url, search_term, fetched_at, self._segment_name, offset, len(data), len(raw),
+                 self.codec, dict_id)
+            )
+            page_id = cursor.lastrowid
+            ids = {library_id for library_id in library_ids if library_id}
+            if ids:
+                self._conn.executemany("INSERT INTO page_ads (page_id, library_id) VALUES (?, ?)",
+                                       [(page_id, library_id) for library_id in ids])
+            self._maybe_train(raw)
+        return page_id
+
+    def find(self, library_id: Optional[str] = None, kind: Optional[str] = None,
+             since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+        """Return index rows for archived pages, filtered by library ID, kind and fetch time."""
+        query = "SELECT DISTINCT p.* FROM pages p"
+        conditions, params = [], []
+        if library_id:
+            query += " JOIN page_ads a ON a.page_id = p.page_id"
+            conditions.append("a.library_id = ?")
+            params.append(library_id)
+        if kind:
+            conditions.append("p.kind = ?")
+            params.append(kind)
+        if since:
+            conditions.append("p.fetched_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("p.fetched_at <= ?")
+            params.append(until)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY p.segment, p.offset"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def read(self, row: Dict) -> str:
+        """Read and decompress one page given its index row."""
+        return read_page(self.root, row, self._codec_for(row['codec'], row['dict_id']))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) AS pages, COALESCE(SUM(raw_size), 0) AS raw_bytes, "
+                "COALESCE(SUM(length), 0) AS stored_bytes FROM pages"
+            ).fetchone()
+            # Pages per codec they were written with, which may differ from this process's default
+            codecs = dict(self._conn.execute("SELECT codec, COUNT(*) FROM pages GROUP BY codec").fetchall())
+        stats = dict(row)
+        stats['ratio'] = round(stats['raw_bytes'] / stats['stored_bytes'], 1) if stats['stored_bytes'] else 0.0
+        stats['codecs'] = codecs
+        stats['dictionary'] = self._dict_id
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._conn.close()
+
+
+def read_page(root: Path, row: Dict, codec: _Codec) -> str:
+    with open(root / row['segment'], "rb") as f:
+        f.seek(row['offset'])
+        data = f.read(row['length'])
+    return codec.decompress(data).decode("utf-8", errors="replace")
+
+
+def _reextract_batch(root: str, rows: List[Dict]) -> Tuple[List[Dict], int]:
+    """Worker: decompress and parse a batch of pages from one segment. Returns (ads, failed pages)."""
+    from page_parsers import parse_page
+
+    root_path = Path(root)
+    codecs: Dict[Tuple[str, Optional[str]], _Codec] = {}
+    ads, failed = [], 0
+    with open(root_path / rows[0]['segment'], "rb") as f:
+        for row in rows:
+            key = (row['codec'], row['dict_id'])
+            if key not in codecs:
+                dictionary = _dict_path(root_path, row['dict_id']).read_bytes() if row['dict_id'] else None
+                codecs[key] = _Codec(row['codec'], dictionary)
+            try:
+                f.seek(row['offset'])
+                html = codecs[key].decompress(f.read(row['length'])).decode("utf-8", errors="replace")
+                for ad in parse_page(row['kind'], html, row['url']):
+                    ad['page_id'] = row['page_id']
+                    ad['fetched_at'] = row['fetched_at']
+                    if row['search_term']:
+                        ad['search_term'] = row['search_term']
+                    ads.append(ad)
+            except Exception as e:
+                print(f"Could not re-extract page {row['page_id']}: {e}", file=sys.stderr)
+                failed += 1
+    return ads, failed
+
+
+def reextract(root: str, rows: List[Dict], processes: Optional[int] = None, batch_size: int = 200,
+              stats: Optional[Dict] = None) -> Iterator[Dict]:
+    """
+    Re-run the current parsers over archived pages in parallel, yielding ads as batches finish.
+    Page and failure counts are written into `stats` if given.
+    """
+    batches = []
+    for row in rows:
+        if not batches or len(batches[-1]) >= batch_size or batches[-1][0]['segment'] != row['segment']:
+            batches.append([])
+        batches[-1].append(row)
+    stats = stats if stats is not None else {}
+    stats.update({'pages': len(rows), 'failed': 0})
+    with ProcessPoolExecutor(max_workers=processes, mp_context=mp.get_context("spawn")) as pool:
+        futures = [pool.submit(_reextract_batch, root, batch) for batch in batches]
+        for future in as_completed(futures):
+            ads, failed = future.result()
+            stats['failed'] += failed
+            yield from ads
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect the raw page archive or re-extract ads from it.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    extract = sub.add_parser("reextract", help="Run the current parsers over archived pages")
+    extract.add_argument('--archive', default="page_archive", help="Archive directory")
+    extract.add_argument('--processes', type=int, default=None, help="Worker processes (default: CPU count)")
+    extract.add_argument('--kind', choices=['search', 'detail'], help="Only pages of this kind")
+    extract.add_argument('--library-id', help="Only pages containing this library ID")
+    extract.add_argument('--since', help="Only pages fetched at or after this ISO time")
+    extract.add_argument('--until', help="Only pages fetched at or before this ISO time")
+    extract.add_argument('--output', default='-', help="NDJSON output file, or '-' for stdout (default)")
+    stats_cmd = sub.add_parser("stats", help="Show archive size and compression ratio")
+    stats_cmd.add_argument('--archive', default="page_archive", help="Archive directory")
+    args = parser.parse_args(argv)
+
+    # Opening a PageArchive creates one; a mistyped path should fail instead
+    if not (Path(args.archive) / "index.db").exists():
+        print(f"No page archive at {args.archive}", file=sys.stderr)
+        return 2
+    archive = PageArchive(args.archive)
+    try:
+        if args.command == "stats":
+            print(json.dumps(archive.get_stats(), indent=2))
+            return 0
+        rows = archive.find(library_id=args.library_id, kind=args.kind, since=args.since, until=args.until)
+    finally:
+        archive.close()
+
+    started = time.monotonic()
+    out = sys.stdout if args.output == '-' else open(args.output, "w", encoding="utf-8")
+    count = 0
+    stats: Dict = {}
+    try:
+        for ad in reextract(args.archive, rows, args.processes, stats=stats):
+            out.write(json.dumps(ad, default=str) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summary = dict(stats, ads=count, elapsed_seconds=round(time.monotonic() - started, 2))
+    print(json.dumps({'summary': summary}, indent=2), file=sys.stderr)
+    return 1 if summary.get('failed') else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Profiling for one search or bulk job.
+
+`profile_job(name)` runs cProfile on the calling thread, samples the stacks of
+every thread the job uses, and traces allocations with tracemalloc. When the
+job ends it writes, next to the results:
+
+    <name>-<timestamp>-<id>.pstats       raw cProfile data (snakeviz, pstats)
+    <name>-<timestamp>-<id>.collapsed    collapsed stacks for flamegraph.pl / speedscope
+    <name>-<timestamp>-<id>-summary.txt  top-N functions, sampled hot spots and allocations
+
+Only one job at a time can run cProfile (Python 3.12+ refuses a second active
+profiler); jobs overlapping it get stack samples and allocations only, and no
+.pstats file. The tracemalloc peak is process-wide, so it is only reported for
+jobs that ran without another profiled job overlapping them.
+
+The CLIs enable it with --profile; the Streamlit and Flask apps with
+SCRAPER_PROFILE=1 (output in SCRAPER_PROFILE_DIR, default ./profiles).
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+DEFAULT_PROFILE_DIR = "profiles"
+
+_cprofile_lock = threading.Lock()
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+# Profiled jobs started so far; a job overlapped by another cannot trust the process-wide peak
+_tracemalloc_jobs = 0
+
+
+def profiling_enabled() -> bool:
+    """Return True if SCRAPER_PROFILE asks the apps to profile every job."""
+    return os.getenv("SCRAPER_PROFILE", "false").lower() in ["1", "true", "yes"]
+
+
+def profile_dir() -> str:
+    return os.getenv("SCRAPER_PROFILE_DIR", DEFAULT_PROFILE_DIR)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Sample the Python stacks of a job's threads at a fixed interval.
+
+    Only the starting thread and threads created after `start()` are sampled,
+    so idle server threads do not drown out the job.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._owner = threading.get_ident()
+        self._ignored = set()
+
+    def start(self):
+        self._ignored = set(sys._current_frames()) - {self._owner}
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or ident in self._ignored:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """Return the samples in Brendan Gregg's collapsed-stack format."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+    def hot_frames(self, top_n: int) -> Dict[str, int]:
+        """Return the frames most often on top of a stack (self time)."""
+        leaves = Counter()
+        for stack, count in self.counts.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return dict(leaves.most_common(top_n))
+
+
+def _start_tracemalloc() -> Optional[int]:
+    """Join tracing; returns the job number when this job runs alone (its peak is measurable), else None."""
+    global _tracemalloc_users, _tracemalloc_owned, _tracemalloc_jobs
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+        _tracemalloc_jobs += 1
+        if _tracemalloc_users > 1:
+            return None
+        # The peak is process-wide; only reset it when no other job is relying on it
+        tracemalloc.reset_peak()
+        return _tracemalloc_jobs
+
+
+def _stop_tracemalloc(job: Optional[int]) -> Optional[int]:
+    """Leave tracing; returns the job's peak traced memory, or None if other jobs overlapped it."""
+    # Concurrent jobs share tracing; only the last one out stops it, and only if we started it
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        peak = tracemalloc.get_traced_memory()[1] if job is not None and job == _tracemalloc_jobs else None
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+        return peak
+
+
+def _start_cprofile() -> Optional[cProfile.Profile]:
+    """Enable cProfile for this job, or return None if another job (or tool) is already profiling."""
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")[:60] or "job"
+
+
+@contextlib.contextmanager
+def profile_job(name: str, output_dir: Optional[str] = None, top_n: int = 25,
+                enabled: bool = True) -> Iterator[Optional[Dict]]:
+    """
+    Profile the enclosed block and write the reports when it exits.
+    Yields a dict that is filled with the written file paths (None when disabled).
+    """
+    if not enabled:
+        yield None
+        return
+    report: Dict = {}
+    base = Path(output_dir or profile_dir())
+    base.mkdir(parents=True, exist_ok=True)
+    stem = base / f"{_safe_name(name)}-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+    job = _start_tracemalloc()
+    before = tracemalloc.take_snapshot()
+    sampler = StackSampler()
+    profiler = _start_cprofile()
+    started = time.monotonic()
+    sampler.start()
+    try:
+        yield report
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _cprofile_lock.release()
+        sampler.stop()
+        elapsed = time.monotonic() - started
+        after = tracemalloc.take_snapshot()
+        peak = _stop_tracemalloc(job)
+
+        if profiler is not None:
+            profiler.dump_stats(f"{stem}.pstats")
+        with open(f"{stem}.collapsed", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+
+        out = io.StringIO()
+        peak_text = (f"{peak / 1024 / 1024:.1f} MiB" if peak is not None
+                     else "not measured (other profiled jobs overlapped this one)")
+        out.write(f"Profile of {name}: {elapsed:.2f}s wall, {sampler.samples} stack samples, "
+                  f"peak traced memory {peak_text}\n\n")
+        if profiler is not None:
+            out.write(f"Top {top_n} functions by cumulative time (calling thread):\n")
+            stats = pstats.Stats(profiler, stream=out)
+            stats.sort_stats("cumulative").print_stats(top_n)
+            out.write(f"Top {top_n} functions by own time (calling thread):\n")
+            stats.sort_stats("tottime").print_stats(top_n)
+        else:
+            out.write("cProfile skipped: another job was being profiled (sampled stacks only)\n\n")
+        out.write("Hottest sampled frames across threads (self samples):\n")
+        for frame, count in sampler.hot_frames(top_n).items():
+            share = count / sum(sampler.counts.values()) if sampler.counts else 0.0
+            out.write(f"  {count:6d} {share:6.1%}  {frame}\n")
+        out.write(f"\nTop {top_n} allocation sites (net growth during the job):\n")
+        for stat in after.compare_to(before, "lineno")[:top_n]:
+            out.write(f"  {stat}\n")
+        with open(f"{stem}-summary.txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+
+        report.update({
+            'pstats': f"{stem}.pstats" if profiler is not None else None,
+            'collapsed': f"{stem}.collapsed",
+            'summary': f"{stem}-summary.txt",
+            'seconds': round(elapsed, 2),
+            'peak_memory_bytes': peak,
+        })
+        print(f"Profile for {name} written to {stem}-summary.txt", file=sys.stderr)
@@ -0,0 +1,272 @@
+"""
+Egress proxy pool with health scoring.
+
+Facebook throttles per IP, so one egress caps the whole scraper. A ProxyPool
+spreads HTTP requests (and browser sessions) over several proxies:
+
+- each proxy keeps an EWMA of its latency and error rate, and work is
+  distributed at random weighted by measured throughput, (1 - error rate) / latency;
+- a proxy whose error rate crosses `eject_error_rate` (or that fails
+  `eject_after_failures` times in a row) is ejected for `eject_seconds`, doubled on
+  every repeat ejection up to `max_eject_seconds`, then re-admitted on probation:
+  its first result either restores it or ejects it again;
+- `sticky_key` pins a login (cookie jar) to one proxy for the login's lifetime
+  (until `release()`), so its browser and HTTP session never use its cookies
+  from two IPs; an ejected sticky proxy keeps serving its login;
+- every proxy has its own FetchScheduler, so rate limits adapt per egress IP.
+
+Configure with PROXY_POOL (comma-separated proxy URLs) or PROXY_POOL_FILE (one per line).
+Run `python proxy_pool.py` to exercise the pool against local stand-in proxies.
+"""
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from rate_limiter import FetchScheduler
+
+
+class Proxy:
+    """Health state of one egress proxy."""
+
+    def __init__(self, url: str, initial_latency: float = 1.0):
+        self.url = url
+        self.scheduler = FetchScheduler()
+        self.latency = initial_latency
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self.ejections = 0
+        self.eject_streak = 0
+        self.ejected_until = 0.0
+        self.probation = False
+
+    @property
+    def weight(self) -> float:
+        """Measured throughput: successful requests per second of latency."""
+        return max(0.01, 1.0 - self.error_rate) / max(self.latency, 0.001)
+
+    def available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def requests_proxies(self) -> Dict[str, str]:
+        """The `proxies=` mapping for requests."""
+        return {'http': self.url, 'https': self.url}
+
+    def chrome_argument(self) -> str:
+        """The Chrome switch routing a browser through this proxy (Chrome ignores credentials in it)."""
+        return f"--proxy-server={self.url}"
+
+    def __repr__(self):
+        return f"Proxy({self.url!r})"
+
+
+class ProxyPool:
+    """Choose proxies by measured throughput, ejecting unhealthy ones and re-admitting them later."""
+
+    def __init__(self, proxy_urls: List[str], alpha: float = 0.2, eject_error_rate: float = 0.5,
+                 min_samples: int = 5, eject_after_failures: int = 3, eject_seconds: float = 30.0,
+                 max_eject_seconds: float = 600.0):
+        if not proxy_urls:
+            raise ValueError("ProxyPool needs at least one proxy URL")
+        self.proxies = [Proxy(url) for url in dict.fromkeys(proxy_urls)]
+        self.alpha = alpha
+        self.eject_error_rate = eject_error_rate
+        self.min_samples = min_samples
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self._sticky: Dict[str, Proxy] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["ProxyPool"]:
+        """Build a pool from PROXY_POOL / PROXY_POOL_FILE, or None when neither is set."""
+        urls = [u.strip() for u in os.getenv("PROXY_POOL", "").split(",") if u.strip()]
+        path = os.getenv("PROXY_POOL_FILE")
+        if path:
+            with open(path, "r", encoding="utf-8") as f:
+                urls += [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+        return cls(urls) if urls else None
+
+    def choose(self, sticky_key: Optional[str] = None, hold: bool = True) -> Proxy:
+        """
+        Pick a proxy for the next request.
+        With `sticky_key`, keep returning the proxy bound to that key, even while it
+        is ejected (the browser launched with it cannot switch); otherwise pick
+        at random, weighted by throughput.
+        When every proxy is ejected, the one due back soonest is used.
+        `hold=False` assigns a long-lived client (a browser) without counting it in flight.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if sticky_key is not None:
+                proxy = self._sticky.get(sticky_key)
+                if proxy is not None:
+                    proxy.in_flight += hold
+                    return proxy
+            candidates = [p for p in self.proxies if p.available(now)]
+            if candidates:
+                # Spread over in-flight work too, so a burst does not all land on the current favourite
+                weights = [p.weight / (1 + p.in_flight) for p in candidates]
+                proxy = random.choices(candidates, weights)[0]
+            else:
+                proxy = min(self.proxies, key=lambda p: p.ejected_until)
+            if sticky_key is not None:
+                self._sticky[sticky_key] = proxy
+            proxy.in_flight += hold
+            return proxy
+
+    def report(self, proxy: Proxy, seconds: float, ok: bool, held: bool = True):
+        """Feed the outcome of one request through `proxy` back into its health score."""
+        now = time.monotonic()
+        with self._lock:
+            if held:
+                proxy.in_flight = max(0, proxy.in_flight - 1)
+            proxy.requests += 1
+            proxy.error_rate += self.alpha * ((0.0 if ok else 1.0) - proxy.error_rate)
+            if ok:
+                proxy.latency += self.alpha * (seconds - proxy.latency)
+                proxy.consecutive_failures = 0
+                if proxy.probation:
+                    proxy.probation = False
+                    proxy.eject_streak = 0
+                return
+            proxy.failures += 1
+            proxy.consecutive_failures += 1
+            unhealthy = (proxy.requests >= self.min_samples and proxy.error_rate >= self.eject_error_rate)
+            if proxy.probation or unhealthy or proxy.consecutive_failures >= self.eject_after_failures:
+                self._eject(proxy, now)
+
+    def _eject(self, proxy: Proxy, now: float):
+        cooldown = min(self.max_eject_seconds, self.eject_seconds * (2 ** proxy.eject_streak))
+        proxy.eject_streak += 1
+        proxy.ejections += 1
+        proxy.ejected_until = now + cooldown
+        # Re-admitted on probation with a clean slate, so one good response restores it
+        proxy.probation = True
+        proxy.error_rate = 0.0
+        proxy.consecutive_failures = 0
+        print(f"Ejected proxy {proxy.url} for {cooldown:.0f}s")
+
+    def release(self, sticky_key: str):
+        """Forget the proxy bound to a login, e.g. after logging out (restart its browser too)."""
+        with self._lock:
+            self._sticky.pop(sticky_key, None)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Return the health of every proxy."""
+        now = time.monotonic()
+        with self._lock:
+            total = sum(p.requests for p in self.proxies)
+            return {
+                p.url: {
+                    'requests': p.requests,
+                    'share': round(p.requests / total, 3) if total else 0.0,
+                    'failures': p.failures,
+                    'error_rate': round(p.error_rate, 3),
+                    'latency_seconds': round(p.latency, 3),
+                    'weight': round(p.weight, 2),
+                    'in_flight': p.in_flight,
+                    'ejected_for': round(max(0.0, p.ejected_until - now), 1),
+                    'ejections': p.ejections,
+                }
+                for p in self.proxies
+            }
+
+
+_default_pool = None
+_default_pool_loaded = False
+_default_lock = threading.Lock()
+
+
+def get_default_proxy_pool() -> Optional[ProxyPool]:
+    """Return the process-wide pool from the environment (None if no proxies are configured)."""
+    global _default_pool, _default_pool_loaded
+    with _default_lock:
+        if not _default_pool_loaded:
+            _default_pool = ProxyPool.from_env()
+            _default_pool_loaded = True
+        return _default_pool
+
+
+def _self_test(requests_count: int = 600, workers: int = 24):
+    """Drive the pool through local stand-in proxies with different speeds and failure rates."""
+    import http.server
+    from concurrent.futures import ThreadPoolExecutor
+
+    import requests
+
+    class Origin(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    def stand_in(delay: float, error_rate: float):
+        class StandInProxy(http.server.BaseHTTPRequestHandler):
+            # A forward proxy receives the absolute URL as the request path
+            def do_GET(self):
+                time.sleep(delay)
+                if random.random() < error_rate:
+                    self.send_response(502)
+                    self.end_headers()
+                    return
+                body = requests.get(self.path, timeout=5).content
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+        return StandInProxy
+
+    servers = []
+
+    def serve(handler) -> str:
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    origin = serve(Origin) + "/"
+    profiles = {'fast': (0.01, 0.0), 'slow': (0.08, 0.0), 'flaky': (0.01, 0.6)}
+    urls = {name: serve(stand_in(*profile)) for name, profile in profiles.items()}
+    names = {url: name for name, url in urls.items()}
+    pool = ProxyPool(list(urls.values()), eject_seconds=1.0)
+    sticky_hits = []
+
+    def fetch(index: int):
+        sticky_key = "login-a" if index % 10 == 0 else None
+        proxy = pool.choose(sticky_key)
+        if sticky_key:
+            sticky_hits.append(names[proxy.url])
+        started = time.monotonic()
+        try:
+            ok = requests.get(origin, proxies=proxy.requests_proxies(), timeout=5).status_code == 200
+        except requests.RequestException:
+            ok = False
+        pool.report(proxy, time.monotonic() - started, ok)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(fetch, range(requests_count)))
+    elapsed = time.monotonic() - started
+    for server in servers:
+        server.shutdown()
+    print(f"{requests_count} requests through {len(urls)} stand-in proxies in {elapsed:.2f}s")
+    for url, stats in pool.get_stats().items():
+        print(f"  {names[url]:>5}: {stats['share']:.0%} of requests, latency {stats['latency_seconds']}s, "
+              f"error rate {stats['error_rate']}, ejections {stats['ejections']}")
+    print(f"  sticky login stayed on: {sorted(set(sticky_hits))}")
+
+
+if __name__ == "__main__":
+    _self_test()
@@ -0,0 +1,219 @@
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# Status codes that mean "slow down" rather than "this request is broken"
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Paths Facebook redirects to when it wants the client to (re)authenticate
+LOGIN_WALL_MARKERS = ("/login", "/checkpoint", "login.php")
+
+
+def host_of(url: str) -> str:
+    """Return the lower-cased host of a URL, without a leading www."""
+    host = urlparse(url).netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    return host or "unknown"
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def looks_like_login_wall(url: Optional[str], html: Optional[str] = None) -> bool:
+    """Check whether a response landed on a Facebook login/checkpoint wall."""
+    if url and 'facebook.com' in host_of(url) and any(marker in url for marker in LOGIN_WALL_MARKERS):
+        return True
+    if html and 'id="login_form"' in html[:200000]:
+        return True
+    return False
+
+
+class TokenBucket:
+    """Classic token bucket: refills at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token, returning how long the caller must wait before using it."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class HostState:
+    """Live rate/concurrency state for a single host."""
+
+    def __init__(self, rate: float, concurrency: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.login_walls = 0
+
+
+class FetchScheduler:
+    """
+    Per-host rate limiter and AIMD concurrency controller shared by every fetch path.
+
+    Each host gets a token bucket (requests per second) and a concurrency window.
+    Healthy responses grow both additively; 429/5xx responses and login walls cut
+    both multiplicatively, and a Retry-After header pauses the host outright.
+    """
+
+    def __init__(self, initial_rate: float = 1.0, min_rate: float = 0.1, max_rate: float = 5.0,
+                 initial_concurrency: float = 2.0, max_concurrency: float = 8.0,
+                 rate_step: float = 0.1, backoff_factor: float = 0.5, burst: float = 2.0,
+                 default_cooldown: float = 30.0):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.rate_step = rate_step
+        self.backoff_factor = backoff_factor
+        self.burst = burst
+        self.default_cooldown = default_cooldown
+        self._hosts: Dict[str, HostState] = {}
+        self._cond = threading.Condition()
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = HostState(self.initial_rate, self.initial_concurrency, self.burst)
+            self._hosts[host] = state
+        return state
+
+    def acquire(self, url: str) -> str:
+        """Block until a request to `url` may start; returns the host key for `release`."""
+        host = host_of(url)
+        with self._cond:
+            state = self._state(host)
+            while True:
+                now = time.monotonic()
+                if state.blocked_until > now:
+                    self._cond.wait(state.blocked_until - now)
+                    continue
+                if state.in_flight >= max(1, int(state.concurrency)):
+                    self._cond.wait(1.0)
+                    continue
+                break
+            state.in_flight += 1
+            state.requests += 1
+            delay = state.bucket.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return host
+
+    def release(self, host: str):
+        """Free the concurrency slot taken by `acquire`."""
+        with self._cond:
+            state = self._state(host)
+            state.in_flight = max(0, state.in_flight - 1)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, url: str):
+        """Context manager wrapping `acquire`/`release` around one fetch."""
+        host = self.acquire(url)
+        try:
+            yield host
+        finally:
+            self.release(host)
+
+    def report(self, url: str, status_code: Optional[int] = None, retry_after: Optional[str] = None,
+               login_wall: bool = False, error: bool = False):
+        """Feed the outcome of a fetch back into the host's AIMD controller."""
+        host = host_of(url)
+        throttled = login_wall or error or (status_code in THROTTLE_STATUS_CODES)
+        with self._cond:
+            state = self._state(host)
+            bucket = state.bucket
+            if throttled:
+                state.throttled += 1
+                if login_wall:
+                    state.login_walls += 1
+                bucket.rate = max(self.min_rate, bucket.rate * self.backoff_factor)
+                state.concurrency = max(1.0, state.concurrency * self.backoff_factor)
+                pause = parse_retry_after(retry_after)
+                if pause is None and (status_code == 429 or login_wall):
+                    pause = self.default_cooldown
+                if pause:
+                    state.blocked_until = max(state.blocked_until, time.monotonic() + pause)
+            else:
+                bucket.rate = min(self.max_rate, bucket.rate + self.rate_step)
+                state.concurrency = min(self.max_concurrency, state.concurrency + 1.0 / state.concurrency)
+            self._cond.notify_all()
+
+    def report_response(self, url: str, response, html: Optional[str] = None):
+        """Convenience wrapper around `report` for a `requests` response to `url`."""
+        self.report(
+            url,
+            status_code=response.status_code,
+            retry_after=response.headers.get('Retry-After'),
+            login_wall=looks_like_login_wall(response.url, html),
+        )
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Return the live rate and concurrency per host."""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                host: {
+                    'rate_per_sec': round(state.bucket.rate, 3),
+                    'concurrency': round(state.concurrency, 2),
+                    'in_flight': state.in_flight,
+                    'requests': state.requests,
+                    'throttled': state.throttled,
+                    'login_walls': state.login_walls,
+                    'paused_for': round(max(0.0, state.blocked_until - now), 1),
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_default_scheduler() -> FetchScheduler:
+    """Return the process-wide scheduler shared by all scraper instances."""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = FetchScheduler()
+        return _default_scheduler
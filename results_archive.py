@@ -0,0 +1,164 @@
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from rate_limiter import host_of
+
+ARCHIVE_SCHEMA = pa.schema([
+    ('run_id', pa.string()),
+    ('run_type', pa.string()),
+    ('fetched_at', pa.timestamp('s')),
+    ('library_id', pa.string()),
+    ('ad_text', pa.string()),
+    ('urls', pa.list_(pa.string())),
+    ('original_urls', pa.list_(pa.string())),
+    ('library_page', pa.string()),
+    ('ad_page_url', pa.string()),
+    ('destination_domain', pa.string()),
+    ('image_url', pa.string()),
+    ('matched_words', pa.list_(pa.string())),
+    ('flagged', pa.bool_()),
+    ('cluster_id', pa.string()),
+    # Partition columns
+    ('date', pa.string()),
+    ('search_term', pa.string()),
+])
+
+PARTITIONING = ds.partitioning(
+    pa.schema([('date', pa.string()), ('search_term', pa.string())]),
+    flavor="hive",
+)
+
+
+def destination_domain(url: Optional[str]) -> Optional[str]:
+    """Return the landing-page host of an ad URL, unwrapping Facebook l.php redirects."""
+    if not url:
+        return None
+    if 'l.php?' in url:
+        target = parse_qs(urlparse(url).query).get('u')
+        if target:
+            url = unquote(target[0])
+    return host_of(url)
+
+
+def _as_list(value) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+class ResultsArchive:
+    """
+    Append-only columnar archive of search and bulk runs.
+
+    Each run is written as new Parquet files in a hive-partitioned dataset
+    (date=YYYY-MM-DD/search_term=...), so queries only open the partitions
+    and columns they need.
+    """
+
+    def __init__(self, root: str = "results_archive"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def append(self, ads: List[Dict], search_term: str, run_type: str = "search",
+               fetched_at: Optional[datetime] = None, run_id: Optional[str] = None) -> str:
+        """
+        Write one run to the archive and return its run ID.
+        Pass the same `run_id` and `fetched_at` to append a long run in several chunks.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        fetched_at = (fetched_at or datetime.now()).replace(microsecond=0)
+        rows = []
+        for ad in ads:
+            urls = _as_list(ad.get('urls'))
+            matched_words = _as_list(ad.get('matched_words'))
+            rows.append({
+                'run_id': run_id,
+                'run_type': run_type,
+                'fetched_at': fetched_at,
+                'library_id': ad.get('library_id'),
+                'ad_text': ad.get('ad_text'),
+                'urls': urls,
+                'original_urls': _as_list(ad.get('original_urls')),
+                'library_page': ad.get('library_page'),
+                'ad_page_url': ad.get('ad_page_url'),
+                'destination_domain': destination_domain(urls[0] if urls else None),
+                'image_url': ad.get('image_url'),
+                'matched_words': matched_words,
+                'flagged': bool(matched_words),
+                'cluster_id': ad.get('cluster_id'),
+                'date': fetched_at.date().isoformat(),
+                'search_term': search_term or "",
+            })
+        if not rows:
+            return run_id
+        table = pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA)
+        ds.write_dataset(
+            table,
+            self.root,
+            format="parquet",
+            partitioning=PARTITIONING,
+            basename_template=f"run-{run_id}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        return run_id
+
+    def _dataset(self):
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING, schema=ARCHIVE_SCHEMA)
+
+    def query(self, columns: Optional[List[str]] = None, search_term: Optional[str] = None,
+              start_date: Optional[date] = None, end_date: Optional[date] = None,
+              flagged_only: bool = False, domain: Optional[str] = None, limit: Optional[int] = None):
+        """
+        Read archived ads as a pandas DataFrame.
+        Only the requested columns are read, and partition filters prune whole directories.
+        """
+        if not any(self.root.rglob("*.parquet")):
+            return pa.Table.from_pylist([], schema=ARCHIVE_SCHEMA).select(columns or ARCHIVE_SCHEMA.names).to_pandas()
+        conditions = []
+        if search_term:
+            conditions.append(ds.field('search_term') == search_term)
+        if start_date:
+            conditions.append(ds.field('date') >= start_date.isoformat())
+        if end_date:
+            conditions.append(ds.field('date') <= end_date.isoformat())
+        if flagged_only:
+            conditions.append(ds.field('flagged') == True)  # noqa: E712 - dataset expression
+        if domain:
+            conditions.append(ds.field('destination_domain') == domain)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        dataset = self._dataset()
+        if limit:
+            table = dataset.head(limit, columns=columns, filter=expression)
+        else:
+            table = dataset.to_table(columns=columns, filter=expression)
+        return table.to_pandas()
+
+    def list_runs(self, search_term: Optional[str] = None, start_date: Optional[date] = None,
+                  end_date: Optional[date] = None):
+        """Summarize archived runs (ad and flag counts per run) using only a few narrow columns."""
+        df = self.query(columns=['run_id', 'run_type', 'fetched_at', 'search_term', 'flagged'],
+                        search_term=search_term, start_date=start_date, end_date=end_date)
+        if df.empty:
+            return df
+        return (df.groupby(['run_id', 'run_type', 'fetched_at', 'search_term'], as_index=False)
+                  .agg(ads=('flagged', 'size'), flagged=('flagged', 'sum'))
+                  .sort_values('fetched_at', ascending=False))
+
+    def search_terms(self) -> List[str]:
+        """Return the archived search terms, read from partition directory names only."""
+        terms = set()
+        for fragment in self._dataset().get_fragments():
+            values = ds.get_partition_keys(fragment.partition_expression)
+            if values.get('search_term') is not None:
+                terms.add(values['search_term'])
+        return sorted(terms)
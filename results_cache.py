@@ -0,0 +1,64 @@
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def make_cache_key(search_term: str, url_patterns: Optional[List[str]] = None,
+                   watch_words: Optional[List[str]] = None, filters: Optional[Dict] = None) -> str:
+    """Hash a normalized form of the search parameters, so trivially different inputs share an entry."""
+    normalized = {
+        'term': " ".join((search_term or "").lower().split()),
+        'patterns': sorted({p.strip() for p in (url_patterns or []) if p and p.strip()}),
+        'watch_words': sorted({w.strip().lower() for w in (watch_words or []) if w and w.strip()}),
+        'filters': filters or {},
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+
+class ResultsCache:
+    """Thread-safe TTL + LRU cache of search results shared by every session."""
+
+    def __init__(self, ttl_seconds: float = 1800, max_entries: int = 200):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Tuple[List[Dict], float]]:
+        """Return (results, age_seconds) for a fresh entry, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            stored_at, results = entry
+        # Callers annotate ads in place (clusters, flags), so hand out a copy
+        return copy.deepcopy(results), now - stored_at
+
+    def put(self, key: str, results: List[Dict]):
+        """Store results, evicting the least recently used entries beyond max_entries."""
+        results = copy.deepcopy(results)
+        with self._lock:
+            self._entries[key] = (time.time(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,204 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+
+from rate_limiter import host_of
+
+
+class CircuitOpenError(Exception):
+    """Raised when a host's circuit breaker is open and calls are being refused."""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}; retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter: sleeps between half and all of base * 2**(attempt-1), capped at max_delay."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Return the sleep before retry number `attempt` (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+
+
+# Policies per error class; classes missing from the map are not retried
+DEFAULT_POLICIES = {
+    'network': RetryPolicy(max_attempts=4, base_delay=1.0, max_delay=15.0),
+    'throttled': RetryPolicy(max_attempts=3, base_delay=10.0, max_delay=120.0),
+    'server': RetryPolicy(max_attempts=3, base_delay=2.0, max_delay=30.0),
+    'browser': RetryPolicy(max_attempts=3, base_delay=3.0, max_delay=30.0),
+}
+
+
+def classify_error(exc: Exception) -> Optional[str]:
+    """Map an exception raised by a fetch to an error class, or None if it is not retryable."""
+    if isinstance(exc, CircuitOpenError):
+        return None
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        status = exc.response.status_code
+        if status == 429:
+            return 'throttled'
+        if status >= 500:
+            return 'server'
+        return None
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return 'network'
+    return None
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: opens after `failure_threshold` consecutive failures for `reset_timeout` seconds.
+    Then it half-opens: one probe call goes through and everyone else is refused until
+    the probe reports back (or has been out for another `reset_timeout`).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        # Hosts with a half-open probe in flight, and when it started
+        self._probing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def before_call(self, host: str):
+        """Raise CircuitOpenError if the host is open; let a single probe through once it half-opens."""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = opened_at + self.reset_timeout - now
+            if remaining > 0:
+                raise CircuitOpenError(host, remaining)
+            probe_started = self._probing.get(host)
+            # A probe that never reported back (e.g. its thread died) is given up on after reset_timeout
+            if probe_started is not None and now - probe_started < self.reset_timeout:
+                raise CircuitOpenError(host, probe_started + self.reset_timeout - now)
+            # Half-open: this call is the probe; it closes the circuit or re-opens it when it reports
+            self._probing[host] = now
+
+    def record_success(self, host: str):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._probing.pop(host, None)
+
+    def record_failure(self, host: str):
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            # A failed probe re-opens the circuit straight away
+            if self._probing.pop(host, None) is not None or failures >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+
+    def release_probe(self, host: str):
+        """End a probe that neither succeeded nor failed (e.g. a 404), so the next call can probe."""
+        with self._lock:
+            self._probing.pop(host, None)
+
+    def get_state(self) -> Dict[str, str]:
+        """Return 'open', 'half-open' (probe in flight) or 'closed' per host that has recorded failures."""
+        now = time.monotonic()
+        with self._lock:
+            hosts = set(self._failures) | set(self._opened_at)
+            return {
+                host: ('half-open' if host in self._probing
+                       else 'open' if self._opened_at.get(host, -self.reset_timeout) + self.reset_timeout > now
+                       else 'closed')
+                for host in hosts
+            }
+
+
+class Retrier:
+    """Run fetch callables with per-error-class retry policies behind a circuit breaker."""
+
+    def __init__(self, breaker: Optional[CircuitBreaker] = None, policies: Optional[Dict[str, RetryPolicy]] = None,
+                 classify: Callable[[Exception], Optional[str]] = classify_error, quiet_mode: bool = True):
+        self.breaker = breaker or get_default_breaker()
+        self.policies = policies or DEFAULT_POLICIES
+        self.classify = classify
+        self.quiet_mode = quiet_mode
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0, 'retry_time_lost': 0.0, 'retries_by_class': {}}
+
+    def call(self, url: str, fn: Callable):
+        """Call `fn()` for a fetch of `url`, retrying according to the matching policy."""
+        host = host_of(url)
+        attempt = 0
+        wasted = 0.0
+        with self._lock:
+            self.stats['calls'] += 1
+        while True:
+            try:
+                self.breaker.before_call(host)
+            except CircuitOpenError:
+                with self._lock:
+                    self.stats['short_circuited'] += 1
+                raise
+            started = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                error_class = self.classify(e)
+                if error_class:
+                    # Only transient failures count against the host; a 404 is a healthy answer
+                    self.breaker.record_failure(host)
+                else:
+                    self.breaker.release_probe(host)
+                policy = self.policies.get(error_class) if error_class else None
+                attempt += 1
+                wasted += time.monotonic() - started
+                if policy is None or attempt >= policy.max_attempts:
+                    with self._lock:
+                        self.stats['failures'] += 1
+                        self.stats['retry_time_lost'] += wasted
+                    raise
+                pause = policy.delay(attempt)
+                if not self.quiet_mode:
+                    print(f"{error_class} error fetching {url} ({e}); retry {attempt} in {pause:.1f}s")
+                with self._lock:
+                    self.stats['retries'] += 1
+                    by_class = self.stats['retries_by_class']
+                    by_class[error_class] = by_class.get(error_class, 0) + 1
+                time.sleep(pause)
+                wasted += pause
+                continue
+            self.breaker.record_success(host)
+            if wasted:
+                with self._lock:
+                    self.stats['retry_time_lost'] += wasted
+            return result
+
+    def get_stats(self) -> Dict:
+        """Return retry counts, time lost to retries and breaker state."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['retries_by_class'] = dict(self.stats['retries_by_class'])
+        stats['retry_time_lost'] = round(stats['retry_time_lost'], 2)
+        stats['circuits'] = self.breaker.get_state()
+        return stats
+
+
+_default_breaker = None
+_default_lock = threading.Lock()
+
+
+def get_default_breaker() -> CircuitBreaker:
+    """Return the process-wide circuit breaker shared by all scraper instances."""
+    global _default_breaker
+    with _default_lock:
+        if _default_breaker is None:
+            _default_breaker = CircuitBreaker()
+        return _default_breaker
@@ -0,0 +1,115 @@
+"""
+Offline concurrency checks for FacebookAdScraper.
+
+Pages and sessions are synthetic, so no browser or network is needed:
+
+- an HTTP-first detail miss (anonymous login wall) escalates to the browser
+  without pausing facebook.com in the scheduler;
+- many concurrent searches with different watch words on one scraper each get
+  exactly their own ads and flags.
+
+Run `python scraper_checks.py`; exits non-zero on failure.
+"""
+import contextlib
+import io
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from facebook_ad_scraper import FacebookAdScraper
+from rate_limiter import FetchScheduler
+
+
+def stress_test(threads: int = 16, searches: int = 400) -> bool:
+    """
+    Run many concurrent searches with different watch words on ONE scraper and
+    check that every result carries exactly its own ads and flags.
+    Pages are synthetic, so no browser or network is needed.
+    """
+    class OfflineScraper(FacebookAdScraper):
+        def setup_driver(self):
+            self.driver = None
+
+        def _http_get(self, url, session=None, raise_for_status=False, **kwargs):
+            term = parse_qs(urlparse(url).query)['q'][0]
+            index = int(term[len("term"):])
+            word = f"word{index % 8}"
+            time.sleep(random.uniform(0, 0.002))  # let threads interleave mid-search
+            cards = "".join(
+                f"<div role='article'>Library ID: {1000000000000000 + index * 100 + i} {term} "
+                f"{word if i % 2 == 0 else 'plain'} offer <a href='https://{term}.example/{i}'>Learn more</a></div>"
+                for i in range(20)
+            )
+            return SimpleNamespace(text=f"<html><body>{cards}</body></html>", status_code=200, url=url)
+
+    scraper = OfflineScraper(quiet_mode=True)
+    errors = []
+
+    def run(index: int):
+        term = f"term{index}"
+        word = f"word{index % 8}"
+        if index % 5 == 0:
+            # Changing the shared watch words must not affect searches in flight
+            scraper.set_watch_words([f"word{random.randrange(8)}"])
+        result = scraper.search_ads(term, watch_words=[word])
+        if len(result) != 20 or any(f"{term}.example" not in ad['urls'][0] for ad in result):
+            errors.append(f"{term}: got ads from another search")
+        if len(result.flagged_ads) != 10:
+            errors.append(f"{term}: expected 10 flags, got {len(result.flagged_ads)}")
+        own_ids = {ad['library_id'] for ad in result}
+        for flagged in result.flagged_ads:
+            if flagged['library_id'] not in own_ids or flagged['matched_words'] != [word]:
+                errors.append(f"{term}: foreign flag {flagged['library_id']} {flagged['matched_words']}")
+
+    started = time.monotonic()
+    # Silence the per-search progress lines
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(run, i) for i in range(searches)]:
+            future.result()
+    elapsed = time.monotonic() - started
+    print(f"{searches} concurrent searches on {threads} threads in {elapsed:.2f}s: "
+          f"{'OK' if not errors else f'{len(errors)} errors'}")
+    for error in errors[:10]:
+        print(f"  {error}")
+    return not errors
+
+
+def escalation_check() -> bool:
+    """
+    Check that an HTTP-first detail miss (anonymous login wall) escalates to the
+    browser without pausing facebook.com in the shared scheduler.
+    """
+    login_wall = "https://www.facebook.com/login/?next=ads"
+
+    class OfflineScraper(FacebookAdScraper):
+        def setup_driver(self):
+            self.driver = SimpleNamespace(current_url=None)
+
+        def ensure_driver_active(self):
+            return True
+
+        def _scrape_ad_browser(self, ad_link):
+            started = time.monotonic()
+            with self.scheduler.slot(ad_link):
+                pass
+            self.browser_wait = time.monotonic() - started
+            return {'library_id': '1', 'ad_text': 'from browser', 'urls': [ad_link]}
+
+    scheduler = FetchScheduler(initial_rate=100.0, burst=100.0)
+    scraper = OfflineScraper(quiet_mode=True, scheduler=scheduler)
+    response = SimpleNamespace(status_code=200, url=login_wall, headers={},
+                               text='<form id="login_form"></form>')
+    scraper._detail_session = SimpleNamespace(get=lambda url, **kwargs: response)
+    ad = scraper.scrape_ad_by_link("https://www.facebook.com/ads/library/?id=1234567890123456")
+    paused = scheduler.get_stats().get('facebook.com', {}).get('paused_for', 0.0)
+    ok = ad is not None and paused == 0.0 and scraper.browser_wait < 1.0
+    print(f"HTTP miss escalated to the browser after {scraper.browser_wait:.3f}s, host paused for {paused}s: "
+          f"{'OK' if ok else 'FAILED'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if escalation_check() and stress_test() else 1)
@@ -0,0 +1,90 @@
+import re
+from typing import Dict, List, Optional
+
+from ad_record import AdRecord
+
+# Same card selector as the HTTP parser in FacebookAdScraper._search_ads_http
+AD_CARD_SELECTOR = "div[role='article'], div[data-testid='ad_card']"
+
+LIBRARY_ID_RE = re.compile(r"\b\d{15,16}\b")
+
+# Installs a MutationObserver that queues ad cards as they are inserted. Cards
+# already on the page are queued once; afterwards only added subtrees are
+# inspected, so each card is visited a constant number of times.
+INSTALL_OBSERVER_SCRIPT = """
+const selector = arguments[0];
+if (window.__adObserver) { window.__adObserver.observer.disconnect(); }
+const state = {queue: [], seen: new WeakSet(), lastMutation: Date.now(), observer: null};
+const enqueue = (card) => {
+    if (!state.seen.has(card)) { state.seen.add(card); state.queue.push(card); }
+};
+const scan = (node) => {
+    if (node.nodeType !== 1) { return; }
+    if (node.matches(selector)) { enqueue(node); }
+    node.querySelectorAll(selector).forEach(enqueue);
+};
+state.observer = new MutationObserver((mutations) => {
+    for (const mutation of mutations) { mutation.addedNodes.forEach(scan); }
+    state.lastMutation = Date.now();
+});
+state.observer.observe(document.body, {childList: true, subtree: true});
+document.querySelectorAll(selector).forEach(enqueue);
+window.__adObserver = state;
+return state.queue.length;
+"""
+
+# Optionally scrolls, then waits until newly queued cards settle (or the timeout
+# passes) and returns just those cards, serialised, through the async callback.
+DRAIN_BATCH_SCRIPT = """
+const [scroll, timeoutMs, settleMs] = arguments;
+const done = arguments[arguments.length - 1];
+const state = window.__adObserver;
+if (!state) { done({error: 'observer not installed'}); return; }
+if (scroll) { window.scrollTo(0, document.body.scrollHeight); }
+const started = Date.now();
+const extract = (card) => {
+    const link = card.querySelector('a[href]');
+    const img = card.querySelector('img[src]');
+    return {text: card.innerText || '', href: link ? link.href : null, image: img ? img.src : null};
+};
+const poll = () => {
+    const now = Date.now();
+    const settled = state.queue.length > 0 && now - state.lastMutation >= settleMs;
+    if (settled || now - started >= timeoutMs) {
+        const cards = state.queue.splice(0, state.queue.length).map(extract);
+        done({cards: cards, height: document.body.scrollHeight});
+        return;
+    }
+    setTimeout(poll, 100);
+};
+poll();
+"""
+
+REMOVE_OBSERVER_SCRIPT = """
+if (window.__adObserver) { window.__adObserver.observer.disconnect(); delete window.__adObserver; }
+"""
+
+
+def record_from_card(card: Dict) -> Optional[AdRecord]:
+    """Build an AdRecord from one card serialised by DRAIN_BATCH_SCRIPT."""
+    href = card.get('href')
+    if not href:
+        return None
+    text = " ".join((card.get('text') or "").split())
+    match = LIBRARY_ID_RE.search(text)
+    return AdRecord(
+        library_id=match.group(0) if match else None,
+        ad_text=text,
+        urls=(href,),
+        library_page=href,
+        image_url=card.get('image'),
+    )
+
+
+def records_from_batch(batch: Dict) -> List[AdRecord]:
+    records = []
+    for card in batch.get('cards') or []:
+        record = record_from_card(card)
+        if record:
+            records.append(record)
+    return records
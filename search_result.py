@@ -0,0 +1,38 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class SearchResult(list):
+    """
+    The ads from one search, carrying that search's own watch-word flags.
+
+    A plain list of ads (dicts or AdRecords) so existing callers keep working;
+    `flagged_ads` belongs to this search only, so concurrent searches on one
+    scraper no longer overwrite each other's flags.
+    """
+
+    def __init__(self, ads: Iterable = (), search_term: Optional[str] = None,
+                 watch_words: Tuple[str, ...] = ()):
+        super().__init__(ads)
+        self.search_term = search_term
+        self.watch_words = tuple(watch_words)
+        self.flagged_ads: List[Dict] = []
+
+    def flag(self, ad, text: Optional[str] = None) -> List[str]:
+        """Check one ad against this search's watch words, marking and recording it on a match."""
+        text = text if text is not None else (ad.get('ad_text') or "")
+        text_lower = text.lower()
+        found_words = [word for word in self.watch_words if word in text_lower]
+        if not found_words:
+            return found_words
+        if isinstance(ad, dict):
+            ad['matched_words'] = found_words
+        else:
+            ad.matched_words = tuple(found_words)
+        self.flagged_ads.append({
+            'matched_words': found_words,
+            'ad_text': text,
+            'library_id': ad.get('library_id'),
+            'library_page': ad.get('library_page'),
+            'urls': ad.get('urls', [])
+        })
+        return found_words
@@ -0,0 +1,326 @@
+"""
+Compact, persistable seen-set for long crawls.
+
+A scalable Bloom filter answers "have we seen this before?" for library IDs,
+destination URLs and creative hashes in a few bits per item instead of a
+Python set entry (~100 bytes) per item. A "no" is always right; a "maybe" is
+wrong with a bounded probability, so when exact answers matter a SeenSet can
+confirm each "maybe" against an on-disk SQLite key table (a temporary one for
+unpersisted runs) or any other store through `exact_check`. New items, the
+common case in a crawl, are only appended to it.
+
+Run `python seen_set.py` to compare memory and false-positive rate with a set.
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import weakref
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+KINDS = ('library_id', 'url', 'creative')
+
+_MAGIC = b"SEENSET1"
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a 128-bit digest."""
+
+    def __init__(self, capacity: int, error_rate: float, bits: Optional[bytearray] = None, count: int = 0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, digest: bytes) -> List[int]:
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def contains(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+    def add(self, digest: bytes):
+        bits = self.bits
+        for p in self._positions(digest):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def estimated_fpr(self) -> float:
+        """False-positive rate at the current fill: (1 - e^(-kn/m))^k."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class ScalableBloomFilter:
+    """
+    A chain of Bloom filters that grows as items are added.
+
+    Each new filter is `growth` times larger with a `tightening` times smaller
+    error rate, so the compound false-positive rate stays under `error_rate`
+    however many items arrive.
+    """
+
+    def __init__(self, initial_capacity: int = 100000, error_rate: float = 0.001, growth: int = 2,
+                 tightening: float = 0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters: List[BloomFilter] = []
+
+    def _grow(self) -> BloomFilter:
+        index = len(self.filters)
+        bloom = BloomFilter(self.initial_capacity * self.growth ** index,
+                            self.error_rate * (1 - self.tightening) * self.tightening ** index)
+        self.filters.append(bloom)
+        return bloom
+
+    def contains(self, digest: bytes) -> bool:
+        return any(bloom.contains(digest) for bloom in self.filters)
+
+    def add(self, digest: bytes):
+        bloom = self.filters[-1] if self.filters and not self.filters[-1].full else self._grow()
+        bloom.add(digest)
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    def memory_bytes(self) -> int:
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+    def estimated_fpr(self) -> float:
+        miss = 1.0
+        for bloom in self.filters:
+            miss *= 1 - bloom.estimated_fpr()
+        return 1 - miss
+
+    def save(self, path: Path):
+        """Write the filter chain atomically: a JSON header line followed by the raw bit arrays."""
+        header = {
+            'initial_capacity': self.initial_capacity, 'error_rate': self.error_rate,
+            'growth': self.growth, 'tightening': self.tightening,
+            'filters': [{'capacity': b.capacity, 'error_rate': b.error_rate, 'count': b.count,
+                         'bytes': len(b.bits)} for b in self.filters],
+        }
+        tmp_path = path.with_suffix(f"{path.suffix}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+            for bloom in self.filters:
+                f.write(bloom.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ScalableBloomFilter":
+        with open(path, "rb") as f:
+            line = f.readline()
+            if not line.startswith(_MAGIC):
+                raise ValueError(f"{path} is not a seen-set file")
+            header = json.loads(line[len(_MAGIC):])
+            chain = cls(header['initial_capacity'], header['error_rate'], header['growth'], header['tightening'])
+            for meta in header['filters']:
+                bits = bytearray(f.read(meta['bytes']))
+                if len(bits) != meta['bytes']:
+                    raise ValueError(f"{path} is truncated")
+                chain.filters.append(BloomFilter(meta['capacity'], meta['error_rate'], bits, meta['count']))
+        return chain
+
+
+class SeenSet:
+    """
+    Seen-set for library IDs, destination URLs and creative hashes.
+
+    `path` persists the filter (`<path>.bloom`, written by `save()`/`close()`).
+    With `exact=True`, keys are also stored as 16-byte digests (in `<path>.db`,
+    or a temporary file removed on `close()` without a path) and every Bloom
+    "maybe" is confirmed there;
+    `exact_check(kind, value)` can instead confirm against another store
+    (returning None to trust the filter). Thread-safe.
+    """
+
+    def __init__(self, path: Optional[str] = None, initial_capacity: int = 100000, error_rate: float = 0.001,
+                 exact: bool = False, exact_check: Optional[Callable[[str, str], Optional[bool]]] = None):
+        self.path = Path(path) if path else None
+        self.exact_check = exact_check
+        self._lock = threading.Lock()
+        self._db = None
+        self._cleanup = None
+        self.stats = {'checks': 0, 'new': 0, 'maybe_seen': 0, 'confirmed': 0, 'false_positives': 0}
+        bloom_path = self._bloom_path()
+        has_bloom = bool(bloom_path and bloom_path.exists())
+        if exact and self.path and has_bloom and not self.path.with_suffix(".db").exists():
+            # Every key in the filter would be "confirmed" unseen against an empty table
+            raise ValueError(f"{bloom_path} was saved without its exact key table; "
+                             f"use it without exact mode or start a new seen-set")
+        if has_bloom:
+            self.bloom = ScalableBloomFilter.load(bloom_path)
+        else:
+            self.bloom = ScalableBloomFilter(initial_capacity, error_rate)
+        if exact:
+            if self.path:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db_path = self.path.with_suffix(".db")
+            else:
+                # On disk even when not persisted, so memory stays bounded however many keys arrive
+                tmp_dir = tempfile.mkdtemp(prefix="seenset-")
+                self._cleanup = weakref.finalize(self, shutil.rmtree, tmp_dir, True)
+                db_path = Path(tmp_dir) / "seen.db"
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS seen (key BLOB PRIMARY KEY) WITHOUT ROWID")
+            self._db.commit()
+            if not has_bloom:
+                # The filter was lost (e.g. a crash before save): rebuild it from the key table
+                for (digest,) in self._db.execute("SELECT key FROM seen"):
+                    self.bloom.add(digest)
+
+    def _bloom_path(self) -> Optional[Path]:
+        return self.path.with_suffix(".bloom") if self.path else None
+
+    def _confirm(self, kind: str, value: str, digest: bytes) -> bool:
+        if self._db is not None:
+            return self._db.execute("SELECT 1 FROM seen WHERE key = ?", (digest,)).fetchone() is not None
+        if self.exact_check is not None:
+            answer = self.exact_check(kind, value)
+            if answer is not None:
+                return answer
+        return True
+
+    def _check_and_add(self, kind: str, value: str, add: bool) -> bool:
+        digest = _digest(f"{kind}\0{value}")
+        self.stats['checks'] += 1
+        if self.bloom.contains(digest):
+            self.stats['maybe_seen'] += 1
+            if self._confirm(kind, value, digest):
+                self.stats['confirmed'] += 1
+                return True
+            self.stats['false_positives'] += 1
+        self.stats['new'] += 1
+        if add:
+            self.bloom.add(digest)
+            if self._db is not None:
+                self._db.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (digest,))
+        return False
+
+    def seen(self, kind: str, value: Optional[str]) -> bool:
+        """Return True if `value` of this kind was added before, without adding it."""
+        if not value:
+            return False
+        with self._lock:
+            return self._check_and_add(kind, value, add=False)
+
+    def check_and_add(self, kind: str, value: Optional[str]) -> bool:
+        """Add `value`; return True if it had been seen already (so the caller can skip it)."""
+        if not value:
+            return False
+        with self._lock:
+            return self._check_and_add(kind, value, add=True)
+
+    def check_and_add_many(self, items: Iterable[Tuple[str, Optional[str]]]) -> List[bool]:
+        """`check_and_add` for a batch of (kind, value) pairs under one lock and one commit."""
+        with self._lock:
+            seen = [self._check_and_add(kind, value, add=True) if value else False for kind, value in items]
+            if self._db is not None:
+                self._db.commit()
+            return seen
+
+    def __len__(self) -> int:
+        return len(self.bloom)
+
+    def get_stats(self) -> Dict:
+        """Return item count, memory, estimated and observed false-positive rates."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'items': len(self.bloom),
+                'filters': len(self.bloom.filters),
+                'memory_bytes': self.bloom.memory_bytes(),
+                'bits_per_item': round(self.bloom.memory_bytes() * 8 / len(self.bloom), 1) if len(self.bloom) else 0.0,
+                'estimated_fpr': round(self.bloom.estimated_fpr(), 6),
+                'exact': self._db is not None or self.exact_check is not None,
+            })
+        # Only measurable when "maybe" answers are confirmed against an exact store
+        negatives = stats['new']
+        stats['observed_fpr'] = (round(stats['false_positives'] / negatives, 6)
+                                 if stats['exact'] and negatives else None)
+        return stats
+
+    def save(self):
+        """Persist the filter (and commit the exact key table)."""
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+            bloom_path = self._bloom_path()
+            if bloom_path:
+                bloom_path.parent.mkdir(parents=True, exist_ok=True)
+                self.bloom.save(bloom_path)
+
+    def close(self):
+        self.save()
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._cleanup is not None:
+                self._cleanup()
+
+
+def ad_seen_key(ad: Dict) -> Tuple[str, Optional[str]]:
+    """
+    The key that identifies an ad in a seen-set: its library ID, or for ads
+    without one a hash of the creative (image digest when cached, else text and URLs).
+    """
+    library_id = ad.get('library_id')
+    if library_id:
+        return 'library_id', library_id
+    creative = ad.get('image_sha256')
+    if not creative:
+        content = json.dumps([ad.get('ad_text'), list(ad.get('urls') or []), ad.get('image_url')])
+        creative = hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+    return 'creative', creative
+
+
+def _benchmark(items: int = 1000000, probes: int = 200000):
+    import time
+    import tracemalloc
+
+    ids = [str(1000000000000000 + i) for i in range(items)]
+    tracemalloc.start()
+    exact = set(ids)
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del exact
+
+    seen = SeenSet(initial_capacity=100000)
+    started = time.monotonic()
+    for library_id in ids:
+        seen.check_and_add('library_id', library_id)
+    add_seconds = time.monotonic() - started
+    false_positives = sum(seen.seen('library_id', str(9000000000000000 + i)) for i in range(probes))
+    stats = seen.get_stats()
+    print(f"{items} library IDs:")
+    print(f"  set:      {set_bytes / 1024 / 1024:.1f} MiB (not counting the ID strings)")
+    print(f"  seen-set: {stats['memory_bytes'] / 1024 / 1024:.1f} MiB in {stats['filters']} filters "
+          f"({stats['bits_per_item']} bits/item), {items / add_seconds:,.0f} adds/s")
+    print(f"  false positives: {false_positives / probes:.5f} observed on {probes} unseen IDs, "
+          f"{stats['estimated_fpr']:.5f} estimated")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,148 @@
+import multiprocessing as mp
+import queue
+import sys
+import time
+from typing import Dict, Iterator, List, Optional
+
+from facebook_ad_scraper import FacebookAdScraper
+from seen_set import SeenSet, ad_seen_key
+
+
+def _worker_main(worker_id: int, tasks, results, cancel, url_patterns: List[str],
+                 watch_words: Optional[List[str]]):
+    """Worker process: owns one scraper (driver + HTTP session) and drains the shared task queue."""
+    # The parent may be streaming results on stdout; keep worker diagnostics off it
+    sys.stdout = sys.stderr
+    scraper = None
+    try:
+        scraper = FacebookAdScraper(quiet_mode=True)
+        if watch_words is not None:
+            scraper.set_watch_words(watch_words)
+        while not cancel.is_set():
+            try:
+                task = tasks.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if task is None:
+                break
+            kind, value = task
+            started = time.monotonic()
+            try:
+                if kind == 'term':
+                    ads = scraper.search_ads(value, url_patterns)
+                else:
+                    ad = scraper.scrape_ad_by_link(value)
+                    ads = [ad] if ad else []
+                for ad in ads:
+                    ad['source'] = value
+                    matched_words = scraper.find_watch_words(ad.get('ad_text') or "")
+                    if matched_words:
+                        ad['matched_words'] = matched_words
+                    results.put(('ad', worker_id, ad))
+                results.put(('done', worker_id, task, len(ads), time.monotonic() - started))
+            except Exception as e:
+                results.put(('error', worker_id, task, str(e), time.monotonic() - started))
+    except Exception as e:
+        results.put(('error', worker_id, None, f"Worker failed to start: {e}", 0.0))
+    finally:
+        if scraper:
+            scraper.close()
+        results.put(('exit', worker_id, None, None, None))
+
+
+class ShardedCrawler:
+    """
+    Coordinate a crawl across a pool of worker processes.
+
+    Search terms and bulk ad links are sharded dynamically through a shared task
+    queue, so fast workers pick up more work. Each worker holds its own scraper,
+    and ads stream back to the parent, which deduplicates them by library_id as
+    they arrive. `cancel()` (or Ctrl+C) stops workers after their current task.
+    """
+
+    def __init__(self, processes: Optional[int] = None, url_patterns: Optional[List[str]] = None,
+                 watch_words: Optional[List[str]] = None, seen: Optional[SeenSet] = None):
+        self.processes = processes or mp.cpu_count()
+        self.url_patterns = url_patterns or []
+        self.watch_words = watch_words
+        # Ads already yielded, in this run or (with a persisted seen-set) earlier ones
+        self.seen = seen if seen is not None else SeenSet(exact=True)
+        self._ctx = mp.get_context("spawn")
+        self._cancel = self._ctx.Event()
+        self.stats: Dict = {}
+
+    def cancel(self):
+        """Ask workers to stop after the task they are currently running."""
+        self._cancel.set()
+
+    def run(self, terms: Optional[List[str]] = None, links: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Yield unique ads as workers produce them; per-worker stats are left in `self.stats`."""
+        tasks = self._ctx.Queue()
+        results = self._ctx.Queue()
+        task_list = [('term', t) for t in (terms or [])] + [('link', l) for l in dict.fromkeys(links or [])]
+        for task in task_list:
+            tasks.put(task)
+        worker_count = max(1, min(self.processes, len(task_list)))
+        for _ in range(worker_count):
+            tasks.put(None)
+
+        workers = [
+            self._ctx.Process(target=_worker_main,
+                              args=(i, tasks, results, self._cancel, self.url_patterns, self.watch_words),
+                              daemon=True)
+            for i in range(worker_count)
+        ]
+        per_worker = {i: {'tasks': 0, 'ads': 0, 'errors': 0, 'busy_seconds': 0.0} for i in range(worker_count)}
+        self.stats = {'tasks': len(task_list), 'unique_ads': 0, 'duplicates': 0, 'errors': [],
+                      'cancelled': False, 'workers': per_worker}
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+
+        running = worker_count
+        try:
+            while running:
+                try:
+                    message = results.get(timeout=1.0)
+                except queue.Empty:
+                    if not any(w.is_alive() for w in workers):
+                        break
+                    continue
+                kind, worker_id = message[0], message[1]
+                if kind == 'ad':
+                    ad = message[2]
+                    per_worker[worker_id]['ads'] += 1
+                    if self.seen.check_and_add(*ad_seen_key(ad)):
+                        self.stats['duplicates'] += 1
+                        continue
+                    self.stats['unique_ads'] += 1
+                    yield ad
+                elif kind == 'done':
+                    per_worker[worker_id]['tasks'] += 1
+                    per_worker[worker_id]['busy_seconds'] += message[4]
+                elif kind == 'error':
+                    per_worker[worker_id]['errors'] += 1
+                    per_worker[worker_id]['busy_seconds'] += message[4]
+                    self.stats['errors'].append({'worker': worker_id, 'task': message[2], 'error': message[3]})
+                elif kind == 'exit':
+                    running -= 1
+        except (KeyboardInterrupt, GeneratorExit):
+            self.cancel()
+            raise
+        finally:
+            # Unread tasks must not block interpreter shutdown after a cancel
+            tasks.cancel_join_thread()
+            if self._cancel.is_set():
+                self.stats['cancelled'] = True
+            for worker in workers:
+                worker.join(timeout=30)
+                if worker.is_alive():
+                    worker.terminate()
+            elapsed = time.monotonic() - started
+            self.stats['elapsed_seconds'] = round(elapsed, 2)
+            self.stats['seen_set'] = self.seen.get_stats()
+            for counts in per_worker.values():
+                busy = counts['busy_seconds']
+                counts['busy_seconds'] = round(busy, 2)
+                counts['tasks_per_sec'] = round(counts['tasks'] / busy, 3) if busy > 0 else 0.0
+                counts['ads_per_sec'] = round(counts['ads'] / busy, 3) if busy > 0 else 0.0
@@ -1,11 +1,20 @@
 import streamlit as st
 import pandas as pd
-from facebook_ad_scraper import FacebookAdScraper
+from dedupe import cluster_ads, cluster_summaries
+from image_cache import ImageCache, group_by_phash
+from landing_pages import LandingPageCrawler
+from results_archive import ResultsArchive
+from results_cache import ResultsCache, make_cache_key
+from user_store import UserStore
+from browser_pool import WarmBrowserPool
+from bulk_ingest import ResultSpool, iter_column, read_columns, unique_links
+from profiling import profile_job, profiling_enabled
 from datetime import datetime
+import math
 import time
-import base64
+import gzip
 import json
-from io import StringIO
+from io import StringIO, BytesIO
 import csv
 import hashlib
 import os
@@ -42,6 +51,8 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+DEFAULT_WATCH_WORDS = ["swimsuit", "underwear", "lingerie", "dating", "labiaplasty", "massage", "breast"]
+
 # Initialize session state variables
 if 'user_id' not in st.session_state:
     st.session_state.user_id = None
@@ -51,59 +62,56 @@ if 'scraper' not in st.session_state:
     st.session_state.scraper = None
 if 'results' not in st.session_state:
     st.session_state.results = None
+if 'bulk_results' not in st.session_state:
+    st.session_state.bulk_results = None
 if 'url_patterns' not in st.session_state:
     st.session_state.url_patterns = [""]
 if 'last_search_time' not in st.session_state:
     st.session_state.last_search_time = None
+if 'watch_words_text' not in st.session_state:
+    st.session_state.watch_words_text = "\n".join(DEFAULT_WATCH_WORDS)
+if 'search_term' not in st.session_state:
+    st.session_state.search_term = ""
 
 # Create necessary directories
 USERS_DIR = Path("users")
 USERS_DIR.mkdir(exist_ok=True)
+# Bulk upload results are spooled here instead of being held in memory
+BULK_SPOOL_DIR = Path(os.getenv("BULK_SPOOL_DIR", "bulk_runs"))
+# Scraped bulk ads are archived and image-cached in batches of this size
+BULK_FLUSH_SIZE = 500
 
 def hash_password(password: str) -> str:
     """Hash a password for storing."""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def load_users() -> dict:
-    """Load users from the users directory."""
-    users = {}
-    for user_file in USERS_DIR.glob("*.json"):
-        with open(user_file, "r") as f:
-            user_data = json.load(f)
-            users[user_data["username"]] = user_data
-    return users
-
-def save_user(username: str, password_hash: str):
-    """Save a new user to the users directory."""
-    user_id = str(uuid.uuid4())
-    user_data = {
-        "username": username,
-        "password_hash": password_hash,
-        "user_id": user_id,
-        "created_at": datetime.now().isoformat()
-    }
-    with open(USERS_DIR / f"{username}.json", "w") as f:
-        json.dump(user_data, f)
-    return user_id
+@st.cache_resource
+def get_user_store():
+    """Indexed user store shared across sessions (imports legacy users/*.json once)."""
+    return UserStore(str(USERS_DIR / "users.db"), legacy_dir=str(USERS_DIR))
+
+def load_user_preferences(user_id: str):
+    """Restore a user's watch words and saved searches at the start of a session."""
+    store = get_user_store()
+    watch_words = store.get_watch_words(user_id)
+    if watch_words is not None:
+        st.session_state.watch_words_text = "\n".join(watch_words)
 
 def authenticate_user(username: str, password: str) -> bool:
     """Authenticate a user."""
-    users = load_users()
-    if username in users:
-        if users[username]["password_hash"] == hash_password(password):
-            st.session_state.user_id = users[username]["user_id"]
-            st.session_state.authenticated = True
-            return True
+    user = get_user_store().get_user(username)
+    if user and user["password_hash"] == hash_password(password):
+        st.session_state.user_id = user["user_id"]
+        st.session_state.authenticated = True
+        load_user_preferences(user["user_id"])
+        return True
     return False
 
 def register_user(username: str, password: str) -> bool:
     """Register a new user."""
-    users = load_users()
-    if username in users:
+    user_id = get_user_store().create_user(username, hash_password(password))
+    if not user_id:
         return False
-    
-    password_hash = hash_password(password)
-    user_id = save_user(username, password_hash)
     st.session_state.user_id = user_id
     st.session_state.authenticated = True
     return True
@@ -115,14 +123,22 @@ def logout_user():
     st.session_state.authenticated = False
     st.session_state.scraper = None
     st.session_state.results = None
+    discard_bulk_results()
     st.session_state.url_patterns = [""]
     st.session_state.last_search_time = None
+    st.session_state.watch_words_text = "\n".join(DEFAULT_WATCH_WORDS)
+    st.session_state.search_term = ""
 
 def initialize_scraper():
     """Initialize or reinitialize the scraper."""
     if st.session_state.scraper:
         st.session_state.scraper.close()
-    st.session_state.scraper = FacebookAdScraper(quiet_mode=True)
+    st.session_state.scraper = get_browser_pool().acquire()
+
+@st.cache_resource
+def get_browser_pool():
+    """Warm standby browser shared across sessions, so new sessions skip Chrome startup."""
+    return WarmBrowserPool(quiet_mode=True)
 
 def cleanup_scraper():
     """Clean up the scraper when the session ends."""
@@ -139,22 +155,264 @@ def remove_url_pattern(index):
     if len(st.session_state.url_patterns) > 1:
         st.session_state.url_patterns.pop(index)
 
-def create_download_link(df, filename, file_format):
-    """Create a download link for the results."""
+DOWNLOAD_MIME_TYPES = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def serialize_results(results_id, _df, file_format, compress):
+    """Serialize a result set once per (results object, format); the DataFrame itself is not hashed."""
+    if file_format == 'parquet':
+        buffer = BytesIO()
+        _df.to_parquet(buffer, index=False)
+        return buffer.getvalue()
     if file_format == 'csv':
-        csv = df.to_csv(index=False)
-        b64 = base64.b64encode(csv.encode()).decode()
-        href = f'data:text/csv;base64,{b64}'
-        ext = 'csv'
+        data = _df.to_csv(index=False).encode()
     else:  # JSON
-        json_str = df.to_json(orient='records', indent=2)
-        b64 = base64.b64encode(json_str.encode()).decode()
-        href = f'data:application/json;base64,{b64}'
-        ext = 'json'
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    download_filename = f'{filename}_{timestamp}.{ext}'
-    return f'<a href="{href}" download="{download_filename}">Download {ext.upper()}</a>'
+        data = _df.to_json(orient='records', indent=2).encode()
+    return gzip.compress(data) if compress else data
+
+def show_download_buttons(entry, filename):
+    """Show download controls; bytes are only generated after the user asks for a format."""
+    col1, col2, col3 = st.columns([2, 1, 2])
+    with col1:
+        file_format = st.selectbox("Format", ["csv", "json", "parquet"], key=f"format_{entry['id']}")
+    with col2:
+        compress = st.checkbox("gzip", value=False, key=f"gzip_{entry['id']}",
+                               disabled=file_format == 'parquet')
+    compress = compress and file_format != 'parquet'
+    prepared = entry.setdefault('prepared', set())
+    with col3:
+        if (file_format, compress) not in prepared:
+            if st.button("Prepare download", key=f"prepare_{entry['id']}"):
+                prepared.add((file_format, compress))
+                st.rerun()
+        else:
+            data = serialize_results(entry['id'], entry['df'], file_format, compress)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            ext = f"{file_format}.gz" if compress else file_format
+            st.download_button(
+                f"Download {ext.upper()}",
+                data=data,
+                file_name=f"{filename}_{timestamp}.{ext}",
+                mime='application/gzip' if compress else DOWNLOAD_MIME_TYPES[file_format],
+                key=f"download_{entry['id']}"
+            )
+
+def store_results(state_key, results, group_duplicates, cache_images, search_term, run_type, archive=True,
+                  scan_landing=False):
+    """Post-process a fresh result set, archive it and keep it in session state so it survives reruns."""
+    entry = {'id': uuid.uuid4().hex, 'ads': results, 'clusters': None, 'image_stats': None, 'landing_stats': None}
+    if group_duplicates:
+        cluster_ads(results)
+        st.session_state.scraper.flag_clusters(results)
+        entry['clusters'] = cluster_summaries(results)
+    if cache_images:
+        with st.spinner("Caching creative images..."):
+            entry['image_stats'] = get_image_cache().attach_images(results)
+        entry['visual_groups'] = len([g for g in group_by_phash(results) if len(g) > 1])
+    if scan_landing:
+        with st.spinner("Scanning landing pages..."):
+            entry['landing_stats'] = get_landing_crawler().scan_ads(results, st.session_state.scraper.watch_words)
+    entry['df'] = pd.DataFrame(results)
+    if archive:
+        try:
+            entry['run_id'] = get_results_archive().append(results, search_term, run_type=run_type)
+        except Exception as e:
+            st.warning(f"Could not archive results: {e}")
+        get_user_store().add_recent_result(st.session_state.user_id, entry.get('run_id'),
+                                           search_term, len(results))
+    st.session_state[state_key] = entry
+
+def show_results(state_key, filename, found_message):
+    """Render the stored results for a tab."""
+    entry = st.session_state.get(state_key)
+    if not entry:
+        return
+    st.success(found_message.format(count=len(entry['ads'])))
+    if entry.get('cache_age') is not None:
+        st.caption(f"Served from cache ({int(entry['cache_age'] // 60)} min old). "
+                   "Tick 'Force refresh' to search again.")
+    if entry['clusters'] is not None:
+        st.info(f"{len(entry['ads'])} ads grouped into {len(entry['clusters'])} clusters")
+        st.dataframe(pd.DataFrame(entry['clusters']))
+    if entry['image_stats'] is not None:
+        stats = entry['image_stats']
+        st.caption(
+            f"Images: {stats['urls']} unique, {stats['hit_rate']:.0%} cache hits, "
+            f"{stats['images_per_sec']} images/s; {entry['visual_groups']} visual-duplicate groups"
+        )
+    if entry.get('landing_stats') is not None:
+        stats = entry['landing_stats']
+        st.caption(f"Landing pages: {stats['destinations']} unique destinations scanned, "
+                   f"{stats['flagged']} ads flagged by their landing page")
+    st.dataframe(entry['df'])
+    show_download_buttons(entry, filename)
+
+def discard_bulk_results():
+    """Close and delete the current bulk run's spool file."""
+    entry = st.session_state.get('bulk_results')
+    if entry and entry.get('spool'):
+        entry['spool'].close(delete=True)
+    st.session_state.bulk_results = None
+
+def run_bulk_ingest(uploaded_file, url_col, cache_images, scan_landing=False):
+    """Scrape each unique link in an upload, streaming rows in and results out to disk."""
+    discard_bulk_results()
+    run_id = uuid.uuid4().hex
+    spool = ResultSpool(BULK_SPOOL_DIR / st.session_state.user_id / f"{run_id}.ndjson")
+    search_term = f"bulk:{uploaded_file.name}"
+    fetched_at = datetime.now()
+    link_stats = {}
+    pending = []
+    status = st.empty()
+
+    def flush_pending():
+        if not pending:
+            return
+        if cache_images:
+            get_image_cache().attach_images(pending)
+        if scan_landing:
+            get_landing_crawler().scan_ads(pending, st.session_state.scraper.watch_words)
+        for ad in pending:
+            spool.append(ad.to_dict())
+        spool.flush()
+        try:
+            get_results_archive().append(pending, search_term, run_type="bulk", fetched_at=fetched_at, run_id=run_id)
+        except Exception as e:
+            st.warning(f"Could not archive results: {e}")
+        pending.clear()
+
+    links = unique_links(iter_column(uploaded_file, uploaded_file.name, url_col), link_stats)
+    for link in links:
+        # Compact AdRecords until the spool serialises them
+        ad = st.session_state.scraper.scrape_ad_by_link(link, as_records=True)
+        if ad:
+            pending.append(ad)
+        if len(pending) >= BULK_FLUSH_SIZE:
+            flush_pending()
+        status.caption(f"Scraped {link_stats['unique']} unique links, {len(spool) + len(pending)} ads so far...")
+    flush_pending()
+    status.empty()
+    get_user_store().add_recent_result(st.session_state.user_id, run_id if len(spool) else None,
+                                       search_term, len(spool))
+    st.session_state.bulk_results = {'id': run_id, 'run_id': run_id, 'spool': spool, 'link_stats': link_stats}
+
+def show_bulk_results(filename):
+    """Render one page of the spooled bulk results, plus a download of the full run."""
+    entry = st.session_state.get('bulk_results')
+    if not entry:
+        return
+    spool = entry['spool']
+    stats = entry['link_stats']
+    st.caption(f"{stats['rows']} rows: {stats['unique']} unique links, "
+               f"{stats['duplicates']} duplicates, {stats['invalid']} invalid")
+    if not len(spool):
+        st.warning("No ads were scraped from the file.")
+        return
+    st.success(f"Scraped {len(spool)} ads successfully")
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        page_size = st.selectbox("Rows per page", [50, 100, 250, 500], key=f"page_size_{entry['id']}")
+    pages = max(1, math.ceil(len(spool) / page_size))
+    with col2:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                               key=f"page_{entry['id']}")
+    st.dataframe(pd.DataFrame(spool.read_page((page - 1) * page_size, page_size)))
+    if not entry.get('download_ready'):
+        if st.button("Prepare download", key=f"prepare_{entry['id']}"):
+            entry['download_ready'] = True
+            st.rerun()
+    else:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        with open(spool.path, "rb") as f:
+            st.download_button("Download NDJSON", data=f, file_name=f"{filename}_{timestamp}.ndjson",
+                               mime="application/x-ndjson", key=f"download_{entry['id']}")
+
+# Search filters currently applied by the scraper; part of the results cache key
+SEARCH_FILTERS = {'country': 'ALL', 'active_status': 'active', 'media_type': 'all', 'ad_type': 'all'}
+
+@st.cache_resource
+def get_results_cache():
+    """Search results cache shared by every session, so repeat queries skip Facebook."""
+    return ResultsCache(
+        ttl_seconds=int(os.getenv("RESULTS_CACHE_TTL", "1800")),
+        max_entries=int(os.getenv("RESULTS_CACHE_MAX_ENTRIES", "200"))
+    )
+
+@st.cache_resource
+def get_results_archive():
+    """Columnar results archive shared across sessions."""
+    return ResultsArchive("results_archive")
+
+HISTORY_COLUMNS = ['fetched_at', 'search_term', 'library_id', 'destination_domain', 'matched_words', 'image_url']
+
+def show_history():
+    """Browse archived runs, reading only the partitions and columns needed."""
+    archive = get_results_archive()
+    terms = archive.search_terms()
+    if not terms:
+        st.info("No archived results yet")
+        return
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        term = st.selectbox("Search term", ["(all)"] + terms)
+    with col2:
+        date_range = st.date_input("Date range", value=(datetime.now().date(), datetime.now().date()))
+    with col3:
+        flagged_only = st.checkbox("Flagged only")
+    start_date, end_date = (date_range if isinstance(date_range, (list, tuple)) and len(date_range) == 2
+                            else (None, None))
+    term = None if term == "(all)" else term
+    runs = archive.list_runs(search_term=term, start_date=start_date, end_date=end_date)
+    st.subheader("Runs")
+    st.dataframe(runs)
+    st.subheader("Ads")
+    st.dataframe(archive.query(columns=HISTORY_COLUMNS, search_term=term, start_date=start_date,
+                               end_date=end_date, flagged_only=flagged_only, limit=5000))
+
+@st.cache_resource
+def get_image_cache():
+    """Image cache shared across sessions."""
+    return ImageCache("image_cache")
+
+@st.cache_resource
+def get_landing_crawler():
+    """Landing page cache shared across sessions, so each destination is fetched once per TTL."""
+    return LandingPageCrawler(
+        ttl_seconds=int(os.getenv("LANDING_PAGE_TTL", "86400")),
+        cache_dir=os.getenv("LANDING_PAGE_CACHE_DIR", "landing_cache")
+    )
+
+def show_saved_searches_sidebar():
+    """Sidebar panels for the user's saved searches and recent result references."""
+    store = get_user_store()
+    saved = store.get_saved_searches(st.session_state.user_id)
+    with st.sidebar.expander("Saved Searches"):
+        if not saved:
+            st.caption("No saved searches yet")
+        else:
+            names = [s['name'] for s in saved]
+            selected = st.selectbox("Saved search", names)
+            search = saved[names.index(selected)]
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Load"):
+                    st.session_state.search_term = search['search_term']
+                    st.session_state.url_patterns = search['url_patterns'] or [""]
+                    st.rerun()
+            with col2:
+                if st.button("Delete"):
+                    store.delete_search(st.session_state.user_id, selected)
+                    st.rerun()
+    with st.sidebar.expander("Recent Results"):
+        recent = store.get_recent_results(st.session_state.user_id)
+        if recent:
+            st.dataframe(pd.DataFrame(recent)[['created_at', 'search_term', 'result_count', 'run_id']])
+        else:
+            st.caption("No recent results")
 
 def show_auth_page():
     """Show the authentication page."""
@@ -206,7 +464,7 @@ def show_main_app():
     if st.session_state.scraper is None:
         initialize_scraper()
     # Create tabs for single search and bulk upload
-    tab_search, tab_bulk = st.tabs(["Search Ads", "Bulk Upload"])
+    tab_search, tab_bulk, tab_history = st.tabs(["Search Ads", "Bulk Upload", "History"])
 
     with tab_search:
         # --- Existing Search Ads UI ---
@@ -216,15 +474,56 @@ def show_main_app():
             st.rerun()
         watch_words_input = st.sidebar.text_area(
             "Watch Words (one per line)",
-            value="swimsuit\nunderwear\nlingerie\ndating\nlabiaplasty\nmassage\nbreast",
+            value=st.session_state.watch_words_text,
             help="Enter words to flag in ad content"
         )
         watch_words = watch_words_input.splitlines()
+        if watch_words_input != st.session_state.watch_words_text:
+            st.session_state.watch_words_text = watch_words_input
+            get_user_store().save_watch_words(st.session_state.user_id, watch_words)
+        show_saved_searches_sidebar()
+        group_duplicates = st.sidebar.checkbox(
+            "Group near-duplicate ads",
+            value=False,
+            help="Cluster ad variants with near-identical text and flag/review them once per cluster"
+        )
+        cache_images = st.sidebar.checkbox(
+            "Cache creative images",
+            value=False,
+            help="Download ad creatives into a local cache before the fbcdn links expire"
+        )
+        scan_landing = st.sidebar.checkbox(
+            "Scan landing pages",
+            value=False,
+            help="Fetch each ad's destination page once and flag watch words found on it"
+        )
         if st.sidebar.button("Reset Scraper"):
             initialize_scraper()
             st.sidebar.success("Scraper reset successfully!")
+        with st.sidebar.expander("Request Rates"):
+            rate_stats = st.session_state.scraper.get_rate_stats()
+            if rate_stats:
+                st.dataframe(pd.DataFrame.from_dict(rate_stats, orient='index'))
+            else:
+                st.caption("No requests made yet")
+            run_stats = st.session_state.scraper.get_run_stats()
+            st.caption(f"Retries: {run_stats['retries']} ({run_stats['retry_time_lost']}s lost to retries)")
+            detail_stats = st.session_state.scraper.get_detail_stats()
+            if detail_stats['pages']:
+                st.caption(f"Ad pages: {detail_stats['http']['share']:.0%} via HTTP "
+                           f"({detail_stats['http']['avg_seconds']}s avg), "
+                           f"{detail_stats['browser']['share']:.0%} via browser "
+                           f"({detail_stats['browser']['avg_seconds']}s avg)")
+            proxy_stats = st.session_state.scraper.get_proxy_stats()
+            if proxy_stats:
+                st.caption("Egress proxies")
+                st.dataframe(pd.DataFrame.from_dict(proxy_stats, orient='index'))
+            pool_stats = get_browser_pool().get_stats()
+            st.caption(f"Warm browser starts: {pool_stats['warm_hits']}, "
+                       f"saved {pool_stats['saved_per_request_seconds']}s each")
         with st.form("search_form"):
-            search_term = st.text_input("Search Term", help="Enter the term to search for in Facebook Ads")
+            search_term = st.text_input("Search Term", value=st.session_state.search_term,
+                                        help="Enter the term to search for in Facebook Ads")
             st.subheader("URL Patterns to Match")
             url_patterns_container = st.container()
             with url_patterns_container:
@@ -237,58 +536,71 @@ def show_main_app():
                             remove_url_pattern(i)
             if st.form_submit_button("Add URL Pattern"):
                 add_url_pattern()
+            force_refresh = st.checkbox("Force refresh", value=False,
+                                        help="Ignore cached results and search Facebook again")
             submitted = st.form_submit_button("Search Ads")
         if submitted and search_term:
+            st.session_state.search_term = search_term
             # Update the scraper with watch words and perform the single ad search
             st.session_state.scraper.set_watch_words(watch_words)
-            with st.spinner(f"Searching for ads for '{search_term}'..."):
-                try:
-                    results = st.session_state.scraper.search_ads(search_term, st.session_state.url_patterns)
-                except Exception as e:
-                    st.error(f"Error during search: {e}")
-                    results = []
+            results_cache = get_results_cache()
+            cache_key = make_cache_key(search_term, st.session_state.url_patterns, watch_words, SEARCH_FILTERS)
+            cached = None if force_refresh else results_cache.get(cache_key)
+            cache_age = None
+            if cached:
+                results, cache_age = cached
+            else:
+                with st.spinner(f"Searching for ads for '{search_term}'..."):
+                    try:
+                        # SCRAPER_PROFILE=1 profiles each search into SCRAPER_PROFILE_DIR
+                        with profile_job(f"search-{search_term}", enabled=profiling_enabled()):
+                            results = st.session_state.scraper.search_ads(search_term,
+                                                                          st.session_state.url_patterns)
+                    except Exception as e:
+                        st.error(f"Error during search: {e}")
+                        results = []
+                if results:
+                    results_cache.put(cache_key, results)
             if results:
-                df = pd.DataFrame(results)
-                st.success(f"Found {len(results)} ads")
-                st.dataframe(df)
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.markdown(create_download_link(df, f"search_ads_{st.session_state.user_id}", "csv"), unsafe_allow_html=True)
-                with col2:
-                    st.markdown(create_download_link(df, f"search_ads_{st.session_state.user_id}", "json"), unsafe_allow_html=True)
+                store_results('results', results, group_duplicates, cache_images, search_term, "search",
+                              archive=cache_age is None, scan_landing=scan_landing)
+                st.session_state.results['cache_age'] = cache_age
             else:
+                st.session_state.results = None
                 st.warning("No ads found for this search")
+        show_results('results', f"search_ads_{st.session_state.user_id}", "Found {count} ads")
+        if st.session_state.search_term:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                saved_name = st.text_input("Save this search as", value=st.session_state.search_term)
+            with col2:
+                if st.button("Save Search") and saved_name:
+                    get_user_store().save_search(st.session_state.user_id, saved_name,
+                                                 st.session_state.search_term,
+                                                 [p for p in st.session_state.url_patterns if p])
+                    st.success(f"Saved search '{saved_name}'")
 
     with tab_bulk:
         st.subheader("Bulk Upload Ads from File")
         uploaded_file = st.file_uploader("Upload CSV or Excel file", type=["csv","xlsx"])
         if uploaded_file:
             try:
-                ext = uploaded_file.name.split('.')[-1].lower()
-                df = pd.read_csv(uploaded_file) if ext=='csv' else pd.read_excel(uploaded_file)
-                url_cols = df.columns.tolist()
-                url_col = st.selectbox("Select URL column", url_cols)
+                # Only the header is read here; rows are streamed when scraping starts
+                url_col = st.selectbox("Select URL column", read_columns(uploaded_file, uploaded_file.name))
+                if group_duplicates:
+                    st.caption("Near-duplicate grouping is not applied to bulk uploads, "
+                               "which are streamed to disk instead of held in memory.")
                 if st.button("Scrape Ads from File"):
-                    with st.spinner(f"Scraping {len(df)} ads..."):
-                        results = []
-                        for link in df[url_col].dropna():
-                            ad = st.session_state.scraper.scrape_ad_by_link(link)
-                            if ad:
-                                results.append(ad)
-                    if results:
-                        df_bulk = pd.DataFrame(results)
-                        st.success(f"Scraped {len(df_bulk)} ads successfully")
-                        st.dataframe(df_bulk)
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(create_download_link(df_bulk, f"bulk_ads_{st.session_state.user_id}", "csv"), unsafe_allow_html=True)
-                        with col2:
-                            st.markdown(create_download_link(df_bulk, f"bulk_ads_{st.session_state.user_id}", "json"), unsafe_allow_html=True)
-                    else:
-                        st.warning("No ads were scraped from the file.")
+                    with st.spinner("Scraping ads from file..."):
+                        with profile_job(f"bulk-{uploaded_file.name}", enabled=profiling_enabled()):
+                            run_bulk_ingest(uploaded_file, url_col, cache_images, scan_landing)
+                show_bulk_results(f"bulk_ads_{st.session_state.user_id}")
             except Exception as e:
                 st.error(f"Error reading file or scraping ads: {e}")
 
+    with tab_history:
+        show_history()
+
 def main():
     """Main application flow."""
     if not st.session_state.authenticated:
@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    user_id TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS saved_searches (
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    search_term TEXT NOT NULL,
+    url_patterns TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS watch_lists (
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    words TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS recent_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    run_id TEXT,
+    search_term TEXT,
+    result_count INTEGER,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recent_results_user ON recent_results (user_id, id);
+"""
+
+
+class UserStore:
+    """
+    SQLite-backed user store with indexed lookups.
+
+    Replaces the one-JSON-file-per-user layout: usernames are a primary key, so
+    logins are a single indexed lookup and concurrent registrations of the same
+    name are rejected by the database instead of racing. Existing users/*.json
+    files are imported the first time the store is opened.
+    """
+
+    def __init__(self, db_path: str = "users/users.db", legacy_dir: Optional[str] = "users",
+                 max_recent_results: int = 20):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_recent_results = max_recent_results
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if legacy_dir:
+            self._import_legacy_users(Path(legacy_dir))
+
+    def _import_legacy_users(self, legacy_dir: Path):
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+                return
+            for user_file in legacy_dir.glob("*.json"):
+                try:
+                    with open(user_file, "r") as f:
+                        user = json.load(f)
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO users (username, password_hash, user_id, created_at) VALUES (?, ?, ?, ?)",
+                        (user["username"], user["password_hash"], user["user_id"],
+                         user.get("created_at") or datetime.now().isoformat())
+                    )
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Skipping unreadable user file {user_file}: {e}")
+
+    def get_user(self, username: str) -> Optional[Dict]:
+        """Look up a user by username."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return dict(row) if row else None
+
+    def create_user(self, username: str, password_hash: str) -> Optional[str]:
+        """Create a user and return its user ID, or None if the username is taken."""
+        user_id = str(uuid.uuid4())
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO users (username, password_hash, user_id, created_at) VALUES (?, ?, ?, ?)",
+                    (username, password_hash, user_id, datetime.now().isoformat())
+                )
+        except sqlite3.IntegrityError:
+            return None
+        return user_id
+
+    def save_search(self, user_id: str, name: str, search_term: str, url_patterns: List[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO saved_searches (user_id, name, search_term, url_patterns, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, name, search_term, json.dumps(url_patterns), datetime.now().isoformat())
+            )
+
+    def get_saved_searches(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, search_term, url_patterns, updated_at FROM saved_searches "
+                "WHERE user_id = ? ORDER BY updated_at DESC", (user_id,)
+            ).fetchall()
+        return [dict(row, url_patterns=json.loads(row['url_patterns'])) for row in rows]
+
+    def delete_search(self, user_id: str, name: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM saved_searches WHERE user_id = ? AND name = ?", (user_id, name))
+
+    def save_watch_words(self, user_id: str, words: List[str], name: str = "default"):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watch_lists (user_id, name, words, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, name, json.dumps(words), datetime.now().isoformat())
+            )
+
+    def get_watch_words(self, user_id: str, name: str = "default") -> Optional[List[str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT words FROM watch_lists WHERE user_id = ? AND name = ?", (user_id, name)
+            ).fetchone()
+        return json.loads(row['words']) if row else None
+
+    def add_recent_result(self, user_id: str, run_id: Optional[str], search_term: str, result_count: int):
+        """Remember a reference to an archived run, keeping only the newest few per user."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO recent_results (user_id, run_id, search_term, result_count, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, run_id, search_term, result_count, datetime.now().isoformat())
+            )
+            self._conn.execute(
+                "DELETE FROM recent_results WHERE user_id = ? AND id NOT IN "
+                "(SELECT id FROM recent_results WHERE user_id = ? ORDER BY id DESC LIMIT ?)",
+                (user_id, user_id, self.max_recent_results)
+            )
+
+    def get_recent_results(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, search_term, result_count, created_at FROM recent_results "
+                "WHERE user_id = ? ORDER BY id DESC", (user_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
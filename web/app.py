@@ -1,5 +1,8 @@
 from flask import Flask, render_template, request, jsonify, send_file
-from facebook_ad_scraper import FacebookAdScraper
+from rate_limiter import get_default_scheduler
+from browser_pool import WarmBrowserPool
+from ad_query import AdQuery
+from profiling import profile_job, profiling_enabled
 import json
 import os
 from datetime import datetime
@@ -12,6 +15,14 @@ app = Flask(__name__)
 # Store the scraper instance
 scraper = None
 last_search_time = None
+browser_pool = None
+
+def get_browser_pool():
+    """Create the warm standby browser pool on first use."""
+    global browser_pool
+    if browser_pool is None:
+        browser_pool = WarmBrowserPool(quiet_mode=False)
+    return browser_pool
 
 def initialize_scraper_if_needed(search_term=None):
     """Initialize the scraper if it doesn't exist or if it's been idle too long."""
@@ -33,26 +44,14 @@ def initialize_scraper_if_needed(search_term=None):
         try:
             # Create the Ad Library URL with the search term
             if search_term:
-                base_url = "https://www.facebook.com/ads/library/"
-                params = {
-                    "active_status": "active",
-                    "ad_type": "all",
-                    "country": "ALL",
-                    "is_targeted_country": "false",
-                    "media_type": "all",
-                    "q": search_term,
-                    "search_type": "keyword_unordered"
-                }
-                # Build the query string
-                query_string = "&".join([f"{k}={v}" for k, v in params.items()])
-                url = f"{base_url}?{query_string}"
+                url = AdQuery(search_term).to_url()
                 print(f"Starting with URL: {url}")
                 
-                # Initialize scraper and navigate to the URL
-                scraper = FacebookAdScraper(quiet_mode=False)
+                # Take the pre-launched browser and navigate to the URL
+                scraper = get_browser_pool().acquire()
                 scraper.driver.get(url)
             else:
-                scraper = FacebookAdScraper(quiet_mode=False)
+                scraper = get_browser_pool().acquire()
         except Exception as e:
             print(f"Error initializing scraper: {str(e)}")
             raise
@@ -71,6 +70,10 @@ def search():
         data = request.get_json() or {}
         search_term = data.get('search_term')
         url_patterns = data.get('url_patterns', [])
+        countries = data.get('countries') or []
+        media_types = data.get('media_types') or []
+        # Each date range is a [start, end] pair of YYYY-MM-DD strings (either may be empty)
+        date_ranges = [tuple(r) for r in data.get('date_ranges') or []]
         
         if not search_term:
             return jsonify({'error': 'Search term is required'}), 400
@@ -78,8 +81,18 @@ def search():
         # Initialize scraper if needed
         initialize_scraper_if_needed(search_term)
         
-        # Perform the search with URL patterns
-        results = scraper.search_ads(search_term, url_patterns)
+        # Perform the search with URL patterns, fanning out over any requested variants
+        try:
+            # SCRAPER_PROFILE=1 profiles each search into SCRAPER_PROFILE_DIR
+            with profile_job(f"web-search-{search_term}", enabled=profiling_enabled()):
+                if countries or media_types or date_ranges:
+                    results = scraper.search_ads_fanout(search_term, url_patterns, countries=countries,
+                                                        media_types=media_types, date_ranges=date_ranges,
+                                                        as_records=True)
+                else:
+                    results = scraper.search_ads(search_term, url_patterns, as_records=True)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Process results
         matches = []
@@ -93,12 +106,13 @@ def search():
                 'image_url': ad.get('image_url'),
                 'original_url': ad.get('original_urls', [''])[0] if ad.get('original_urls') else None,
                 'final_url': ad.get('urls', [''])[0] if ad.get('urls') else None,
-                'ad_page_url': ad.get('ad_page_url')
+                'ad_page_url': ad.get('ad_page_url'),
+                'variants': ad.get('variants')
             }
             
             # Check if this is a flagged ad
-            if 'matched_words' in ad:
-                ad_info['matched_words'] = ad['matched_words']
+            if ad.get('matched_words'):
+                ad_info['matched_words'] = ad.get('matched_words')
                 flagged_ads.append(ad_info)
             else:
                 matches.append(ad_info)
@@ -179,6 +193,20 @@ def download():
         if format_type == 'json' and os.path.exists(filename):
             os.remove(filename)
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Return the live per-host request rate and concurrency."""
+    try:
+        return jsonify({
+            'hosts': get_default_scheduler().get_stats(),
+            'retries': scraper.get_run_stats() if scraper else None,
+            'detail_tiers': scraper.get_detail_stats() if scraper else None,
+            'proxies': scraper.get_proxy_stats() if scraper else None,
+            'browser_pool': browser_pool.get_stats() if browser_pool else None
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/cleanup', methods=['POST'])
 def cleanup():
     global scraper, last_search_time